@@ -1,17 +1,33 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Query
-from fastapi.responses import RedirectResponse
+from fastapi import FastAPI, APIRouter, HTTPException, Query, Request, Header, Depends
+from fastapi.responses import RedirectResponse, FileResponse, JSONResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
+from starlette.datastructures import MutableHeaders
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field, ConfigDict
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 import uuid
 from datetime import datetime, timezone
 import httpx
 import json
+import heapq
+import itertools
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+import hmac
+import ipaddress
+import socket
+import hashlib
+import re
+import math
+import zlib
+import asyncio
+import concurrent.futures
 from groq import AsyncGroq
 
 ROOT_DIR = Path(__file__).parent
@@ -82,19 +98,42 @@ class Frame(BaseModel):
     width: float
     height: float
 
+class BoardAsset(BaseModel):
+    id: str
+    type: str
+    title: str = ""
+    x: float
+    y: float
+    width: float
+    height: float
+    source_url: Optional[str] = None
+    # Miro modifiedAt, so an edited asset is downloaded again
+    version: str = ""
+    content_hash: Optional[str] = None
+    content_type: Optional[str] = None
+    size: Optional[int] = None
+
 class MiroBoard(BaseModel):
     id: str
     name: str
     frames: List[Frame]
     sticky_notes: List[StickyNote]
+    assets: List[BoardAsset] = []
 
 class SummarizeRequest(BaseModel):
     notes: List[str]
     frame_title: str
+    # Optional [x, y] per note, used to cluster oversized frames spatially
+    positions: Optional[List[Tuple[float, float]]] = None
+    # Slide template, used for per-template model overrides
+    template: Optional[str] = None
 
 class SlideContent(BaseModel):
     title: str
     bullets: List[str]
+    tokens_saved: int = 0
+    # LLM that wrote the slide, or "extractive" for the local summarizer
+    model: Optional[str] = None
 
 class ExportRecord(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -194,6 +233,1184 @@ def map_notes_to_frames(frames: List[Frame], notes: List[StickyNote]) -> dict:
     
     return frame_notes
 
+# ==================== CIRCUIT BREAKERS ====================
+
+BREAKER_WINDOW_SECONDS = float(os.environ.get('BREAKER_WINDOW_SECONDS', '30'))
+BREAKER_MIN_CALLS = int(os.environ.get('BREAKER_MIN_CALLS', '5'))
+BREAKER_ERROR_RATE = float(os.environ.get('BREAKER_ERROR_RATE', '0.5'))
+BREAKER_OPEN_SECONDS = float(os.environ.get('BREAKER_OPEN_SECONDS', '30'))
+BREAKER_HALF_OPEN_PROBES = int(os.environ.get('BREAKER_HALF_OPEN_PROBES', '1'))
+# Calls slower than this count as failures
+MIRO_SLOW_CALL_SECONDS = float(os.environ.get('MIRO_SLOW_CALL_SECONDS', '10'))
+GROQ_SLOW_CALL_SECONDS = float(os.environ.get('GROQ_SLOW_CALL_SECONDS', '20'))
+
+class CircuitOpenError(Exception):
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"{name} is unavailable (circuit open), retry in {retry_after:.0f}s")
+        self.name = name
+        self.retry_after = retry_after
+
+class CircuitBreaker:
+    """Per-upstream breaker over a rolling window of recent calls.
+
+    Opens when the share of failed or slow calls in the window reaches
+    ``error_rate`` (after ``min_calls``). While open every call fails fast; after
+    ``open_seconds`` a few probe calls are let through (half-open) and their
+    outcome closes or re-opens the breaker.
+    """
+
+    def __init__(self, name: str, slow_call_seconds: float, window_seconds: float = BREAKER_WINDOW_SECONDS,
+                 min_calls: int = BREAKER_MIN_CALLS, error_rate: float = BREAKER_ERROR_RATE,
+                 open_seconds: float = BREAKER_OPEN_SECONDS, half_open_probes: int = BREAKER_HALF_OPEN_PROBES,
+                 clock=time.monotonic):
+        self.name = name
+        self.slow_call_seconds = slow_call_seconds
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self.clock = clock
+        self.state = "closed"
+        self.generation = 0
+        self.opened_at = 0.0
+        self.probes_in_flight = 0
+        self.calls: deque = deque()  # (finished_at, failed)
+
+    def _trim(self, now: float):
+        while self.calls and self.calls[0][0] < now - self.window_seconds:
+            self.calls.popleft()
+
+    def before_call(self) -> tuple:
+        """Raise CircuitOpenError unless a call may go upstream now.
+
+        Returns the call's token: the breaker generation it started in and
+        whether it is a half-open probe. Every state change starts a new
+        generation, so calls that started earlier cannot decide a probe's outcome.
+        """
+        now = self.clock()
+        if self.state == "open":
+            if now - self.opened_at < self.open_seconds:
+                raise CircuitOpenError(self.name, self.open_seconds - (now - self.opened_at))
+            self._transition("half_open")
+            self.probes_in_flight = 0
+            logger.info(f"Circuit breaker '{self.name}' half-open, probing upstream")
+        if self.state == "half_open":
+            if self.probes_in_flight >= self.half_open_probes:
+                raise CircuitOpenError(self.name, self.open_seconds)
+            self.probes_in_flight += 1
+            return (self.generation, True)
+        return (self.generation, False)
+
+    def record(self, ok: bool, latency: float, token: tuple):
+        generation, probe = token
+        if generation != self.generation:
+            # Started before the last state change; its outcome says nothing about the current state
+            return
+        now = self.clock()
+        failed = not ok or latency > self.slow_call_seconds
+        if probe:
+            self.probes_in_flight = max(0, self.probes_in_flight - 1)
+            if failed:
+                self._open(now)
+            else:
+                self._transition("closed")
+                self.calls.clear()
+                logger.info(f"Circuit breaker '{self.name}' closed")
+            return
+        
+        self.calls.append((now, failed))
+        self._trim(now)
+        failures = sum(1 for _, call_failed in self.calls if call_failed)
+        if len(self.calls) >= self.min_calls and failures / len(self.calls) >= self.error_rate:
+            self._open(now)
+
+    def release(self, token: tuple):
+        """A call was cancelled before it finished; free its probe slot without judging it"""
+        generation, probe = token
+        if probe and generation == self.generation:
+            self.probes_in_flight = max(0, self.probes_in_flight - 1)
+
+    def _transition(self, state: str):
+        self.state = state
+        self.generation += 1
+
+    def _open(self, now: float):
+        self._transition("open")
+        self.opened_at = now
+        self.calls.clear()
+        logger.warning(f"Circuit breaker '{self.name}' opened, failing fast for {self.open_seconds:.0f}s")
+
+    async def call(self, fn, *args, **kwargs):
+        token = self.before_call()
+        start = self.clock()
+        try:
+            result = await fn(*args, **kwargs)
+        except asyncio.CancelledError:
+            self.release(token)
+            raise
+        except Exception:
+            self.record(False, self.clock() - start, token)
+            raise
+        self.record(True, self.clock() - start, token)
+        return result
+
+    def status(self) -> dict:
+        now = self.clock()
+        if self.state == "open" and now - self.opened_at >= self.open_seconds:
+            state = "half_open"
+        else:
+            state = self.state
+        self._trim(now)
+        failures = sum(1 for _, failed in self.calls if failed)
+        return {
+            "state": state,
+            "recent_calls": len(self.calls),
+            "recent_failures": failures,
+            "retry_after": max(0.0, self.open_seconds - (now - self.opened_at)) if state == "open" else 0.0
+        }
+
+class _UpstreamErrorResponse(Exception):
+    def __init__(self, response: httpx.Response):
+        self.response = response
+
+class CircuitBreakerTransport(httpx.AsyncBaseTransport):
+    """httpx transport that sends every request through a circuit breaker.
+
+    Transport errors, 5xx and 429 responses count as failures; other 4xx
+    answers mean the upstream is healthy.
+    """
+
+    def __init__(self, breaker: CircuitBreaker, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.breaker = breaker
+        self.transport = transport or httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        async def send():
+            response = await self.transport.handle_async_request(request)
+            if response.status_code >= 500 or response.status_code == 429:
+                # Let the breaker see it as a failure, but still hand the response back
+                raise _UpstreamErrorResponse(response)
+            return response
+        try:
+            return await self.breaker.call(send)
+        except _UpstreamErrorResponse as e:
+            return e.response
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+miro_breaker = CircuitBreaker("miro", slow_call_seconds=MIRO_SLOW_CALL_SECONDS)
+groq_breaker = CircuitBreaker("groq", slow_call_seconds=GROQ_SLOW_CALL_SECONDS)
+
+def miro_http_client() -> httpx.AsyncClient:
+    """HTTP client for Miro calls, guarded by the Miro circuit breaker"""
+    return httpx.AsyncClient(transport=CircuitBreakerTransport(miro_breaker))
+
+# ==================== ADMISSION CONTROL ====================
+
+# Lower number = served first. Lower classes are also shed earlier: they may
+# only fill their share of an endpoint's queue.
+PRIORITY_CLASSES = {"interactive": 0, "batch": 1, "background": 2}
+PRIORITY_QUEUE_SHARE = {0: 1.0, 1: 0.75, 2: 0.5}
+
+def _admission_limit(name: str, concurrent: int, queue: int):
+    prefix = f"ADMISSION_{name.upper()}"
+    return (int(os.environ.get(f"{prefix}_CONCURRENCY", str(concurrent))),
+            int(os.environ.get(f"{prefix}_QUEUE", str(queue))))
+
+class AdmissionRejected(Exception):
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"{name} is at capacity, retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+class AdmissionController:
+    """Concurrency limit with a bounded priority queue for one endpoint"""
+
+    def __init__(self, name: str, max_concurrent: int, max_queue: int):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.running = 0
+        self.waiters: list = []  # heap of [priority, seq, future]
+        self._seq = itertools.count()
+        self.admitted = 0
+        self.rejected = 0
+        # Moving average of how long an admitted request holds its slot
+        self.avg_service_seconds = 1.0
+
+    def retry_after(self) -> float:
+        backlog = (len(self.waiters) + 1) / max(1, self.max_concurrent)
+        return max(1.0, backlog * self.avg_service_seconds)
+
+    async def acquire(self, priority: int = 0):
+        if self.running < self.max_concurrent and not self.waiters:
+            self.running += 1
+            self.admitted += 1
+            return
+        
+        if len(self.waiters) >= int(self.max_queue * PRIORITY_QUEUE_SHARE.get(priority, 1.0)):
+            self.rejected += 1
+            raise AdmissionRejected(self.name, self.retry_after())
+        
+        entry = [priority, next(self._seq), asyncio.get_running_loop().create_future()]
+        heapq.heappush(self.waiters, entry)
+        try:
+            await entry[2]
+        except asyncio.CancelledError:
+            if entry[2].done() and not entry[2].cancelled():
+                # A slot was handed over just as the client went away; pass it on
+                self._hand_off()
+            else:
+                self.waiters.remove(entry)
+                heapq.heapify(self.waiters)
+            raise
+        self.admitted += 1
+
+    def release(self, service_seconds: float):
+        self.avg_service_seconds = 0.8 * self.avg_service_seconds + 0.2 * service_seconds
+        self._hand_off()
+
+    def _hand_off(self):
+        """Give the freed slot to the best waiter, or return it to the pool"""
+        while self.waiters:
+            _, _, future = heapq.heappop(self.waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self.running -= 1
+
+    def status(self) -> dict:
+        queued_by_priority = {name: 0 for name in PRIORITY_CLASSES}
+        for priority, _, _ in self.waiters:
+            for name, value in PRIORITY_CLASSES.items():
+                if value == priority:
+                    queued_by_priority[name] += 1
+        return {
+            "running": self.running,
+            "queued": len(self.waiters),
+            "queued_by_priority": queued_by_priority,
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "avg_service_seconds": round(self.avg_service_seconds, 3)
+        }
+
+admission_controllers: Dict[str, AdmissionController] = {
+    name: AdmissionController(name, *_admission_limit(name, concurrent, queue))
+    for name, concurrent, queue in [
+        ("summarize", 8, 32),
+        ("summarize_all", 2, 8),
+        ("board_load", 4, 16),
+        ("batch_export", 1, 4),
+    ]
+}
+
+def admission(name: str):
+    """Route dependency holding one of the endpoint's slots for the whole request.
+
+    The ``X-Priority`` header picks the class (interactive, batch or background).
+    A full queue answers 503 with Retry-After right away.
+    """
+    async def admit(x_priority: Optional[str] = Header(None)):
+        controller = admission_controllers[name]
+        priority = PRIORITY_CLASSES.get((x_priority or "interactive").lower(), PRIORITY_CLASSES["interactive"])
+        try:
+            await controller.acquire(priority)
+        except AdmissionRejected as e:
+            logger.warning(f"Shedding {name} request: {str(e)}")
+            raise HTTPException(
+                status_code=503,
+                detail=str(e),
+                headers={"Retry-After": str(math.ceil(e.retry_after))}
+            )
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            controller.release(time.monotonic() - started)
+    return admit
+
+# ==================== MIRO BOARD PARSING ====================
+
+FRAME_ITEM_TYPE = "frame"
+CONTENT_ITEM_TYPES = ["sticky_note", "text", "shape", "card"]
+ASSET_ITEM_TYPES = ["image", "document", "embed", "preview"]
+BOARD_ITEM_TYPES = [FRAME_ITEM_TYPE] + CONTENT_ITEM_TYPES + ASSET_ITEM_TYPES
+
+MIRO_COLOR_MAP = {
+    "light_yellow": "yellow", "yellow": "yellow",
+    "light_blue": "blue", "blue": "blue",
+    "light_green": "green", "green": "green",
+    "light_pink": "pink", "pink": "pink",
+    "violet": "pink", "cyan": "blue", "orange": "yellow",
+    "gray": "yellow", "dark_blue": "blue",
+    "dark_green": "green", "red": "pink"
+}
+
+def extract_item_content(item: dict) -> str:
+    """Extract text content from various item types"""
+    item_type = item.get("type")
+    content = ""
+    
+    if item_type == "sticky_note":
+        content = item.get("data", {}).get("content", "")
+    elif item_type == "text":
+        content = item.get("data", {}).get("content", "")
+    elif item_type == "shape":
+        content = item.get("data", {}).get("content", "")
+    elif item_type == "card":
+        title = item.get("data", {}).get("title", "")
+        desc = item.get("data", {}).get("description", "")
+        content = f"{title}: {desc}" if title and desc else title or desc
+    
+    # Strip HTML tags
+    return re.sub(r'<[^>]+>', '', content).strip()
+
+def get_item_color(item: dict) -> str:
+    """Get color from item style"""
+    fill_color = item.get("style", {}).get("fillColor", "yellow")
+    return MIRO_COLOR_MAP.get(fill_color, "yellow")
+
+def parse_frames(all_items: List[dict]):
+    """First pass: collect frames and their absolute positions"""
+    frames = []
+    frame_map = {}  # id -> frame position and title, used to resolve child coordinates
+    
+    for item in all_items:
+        item_type = item.get("type")
+        if item_type == FRAME_ITEM_TYPE:
+            frame_id = item["id"]
+            frame_x = item.get("position", {}).get("x", 0)
+            frame_y = item.get("position", {}).get("y", 0)
+            frame_width = item.get("geometry", {}).get("width", 600)
+            frame_height = item.get("geometry", {}).get("height", 400)
+            
+            frame = Frame(
+                id=frame_id,
+                title=item.get("data", {}).get("title", "Untitled Frame"),
+                x=frame_x,
+                y=frame_y,
+                width=frame_width,
+                height=frame_height
+            )
+            frames.append(frame)
+            frame_map[frame_id] = {
+                "title": frame.title,
+                "x": frame_x,
+                "y": frame_y,
+                "width": frame_width,
+                "height": frame_height
+            }
+    
+    return frames, frame_map
+
+def parse_content_items(items: List[dict], frame_map: dict, types: Optional[List[str]] = None) -> List[StickyNote]:
+    """Second pass: collect content items and handle parent relationships.
+
+    Only depends on its arguments so chunks can be parsed in worker processes.
+    """
+    sticky_notes = []
+    
+    for item in items:
+        item_type = item.get("type")
+        
+        # Skip frames and non-content items
+        if item_type not in CONTENT_ITEM_TYPES:
+            continue
+        if types is not None and item_type not in types:
+            continue
+        
+        content = extract_item_content(item)
+        if not content:
+            continue
+        
+        # Get position - check if item has a parent (is inside a frame)
+        parent_id = item.get("parent", {}).get("id") if item.get("parent") else None
+        item_x = item.get("position", {}).get("x", 0)
+        item_y = item.get("position", {}).get("y", 0)
+        
+        # If item is inside a frame, its coordinates are RELATIVE to the frame
+        # Convert to absolute coordinates for mapping
+        if parent_id and parent_id in frame_map:
+            parent_frame = frame_map[parent_id]
+            # Item position is relative to frame center, convert to absolute
+            abs_x = parent_frame["x"] + item_x
+            abs_y = parent_frame["y"] + item_y
+            logger.debug(f"Item '{content[:30]}' is child of frame '{parent_frame['title']}', relative pos ({item_x}, {item_y}), absolute ({abs_x}, {abs_y})")
+        else:
+            abs_x = item_x
+            abs_y = item_y
+        
+        sticky_notes.append(StickyNote(
+            id=item["id"],
+            text=content,
+            x=abs_x,
+            y=abs_y,
+            width=item.get("geometry", {}).get("width", 150),
+            height=item.get("geometry", {}).get("height", 100),
+            color=get_item_color(item)
+        ))
+        logger.debug(f"Added content item: '{content[:50]}' at ({abs_x}, {abs_y})")
+    
+    return sticky_notes
+
+def get_asset_source(item: dict) -> Optional[str]:
+    """URL to download for an asset item (embeds and link previews only have a thumbnail)"""
+    data = item.get("data", {})
+    item_type = item.get("type")
+    if item_type == "image":
+        return data.get("imageUrl")
+    if item_type == "document":
+        return data.get("documentUrl")
+    return data.get("previewUrl")
+
+def parse_asset_items(items: List[dict], frame_map: dict, types: Optional[List[str]] = None) -> List[BoardAsset]:
+    """Collect image, document, embed and preview items with absolute positions"""
+    assets = []
+    for item in items:
+        item_type = item.get("type")
+        if item_type not in ASSET_ITEM_TYPES:
+            continue
+        if types is not None and item_type not in types:
+            continue
+        
+        parent_id = item.get("parent", {}).get("id") if item.get("parent") else None
+        x = item.get("position", {}).get("x", 0)
+        y = item.get("position", {}).get("y", 0)
+        if parent_id and parent_id in frame_map:
+            x += frame_map[parent_id]["x"]
+            y += frame_map[parent_id]["y"]
+        
+        data = item.get("data", {})
+        assets.append(BoardAsset(
+            id=item["id"],
+            type=item_type,
+            title=data.get("title") or data.get("url") or "",
+            x=x,
+            y=y,
+            width=item.get("geometry", {}).get("width", 0) or 0,
+            height=item.get("geometry", {}).get("height", 0) or 0,
+            source_url=get_asset_source(item),
+            version=item.get("modifiedAt", "")
+        ))
+    return assets
+
+def parse_board_items(all_items: List[dict], types: Optional[List[str]] = None):
+    """Turn raw Miro items into frames and content notes.
+
+    Frames are always used to resolve child coordinates, but are only returned
+    when ``types`` is unset or includes ``frame``.
+    """
+    frames, frame_map = parse_frames(all_items)
+    logger.info(f"Found {len(frames)} frames")
+    
+    sticky_notes = parse_content_items(all_items, frame_map, types)
+    
+    if types is not None and FRAME_ITEM_TYPE not in types:
+        frames = []
+    
+    return frames, sticky_notes
+
+async def fetch_board_items(http_client: httpx.AsyncClient, board_id: str, access_token: str, params: Optional[dict] = None) -> List[dict]:
+    """Fetch ALL items matching ``params`` with pagination"""
+    all_items = []
+    cursor = None
+    
+    while True:
+        page_params = {"limit": 50, **(params or {})}
+        if cursor:
+            page_params["cursor"] = cursor
+        
+        items_response = await http_client.get(
+            f"{MIRO_API_BASE}/boards/{board_id}/items",
+            headers={"Authorization": f"Bearer {access_token}"},
+            params=page_params
+        )
+        items_response.raise_for_status()
+        items_data = items_response.json()
+        
+        all_items.extend(items_data.get("data", []))
+        
+        cursor = items_data.get("cursor")
+        if not cursor:
+            break
+    
+    return all_items
+
+async def fetch_filtered_board_items(
+    http_client: httpx.AsyncClient,
+    board_id: str,
+    access_token: str,
+    types: Optional[List[str]] = None,
+) -> List[dict]:
+    """Fetch only the item types a filtered board view needs.
+
+    Type filters are pushed down to Miro as one ``type=`` listing per requested
+    type. Frames are always fetched because child coordinates are relative to
+    them. Frame filters are not pushed down: frame membership is positional, and
+    loose items placed inside a frame are not listed as its children.
+    """
+    if types is None:
+        return await fetch_board_items(http_client, board_id, access_token)
+    
+    content_types = [t for t in types if t != FRAME_ITEM_TYPE]
+    pages = await asyncio.gather(*(
+        fetch_board_items(http_client, board_id, access_token, {"type": item_type})
+        for item_type in [FRAME_ITEM_TYPE] + content_types
+    ))
+    return [item for items in pages for item in items]
+
+# ==================== CPU OFFLOAD ====================
+
+# Where CPU-heavy parsing and mapping run: "process", "thread" or "inline" (on the event loop).
+# On a single core a process pool only adds pickling cost, so threads are the default there.
+BOARD_PARSE_EXECUTOR = os.environ.get('BOARD_PARSE_EXECUTOR', 'process' if (os.cpu_count() or 1) > 1 else 'thread')
+BOARD_PARSE_WORKERS = int(os.environ.get('BOARD_PARSE_WORKERS', str(os.cpu_count() or 2)))
+BOARD_PARSE_CHUNK_SIZE = int(os.environ.get('BOARD_PARSE_CHUNK_SIZE', '5000'))
+# Boards smaller than this are parsed inline, where a pool round-trip costs more than it saves
+BOARD_PARSE_OFFLOAD_THRESHOLD = int(os.environ.get('BOARD_PARSE_OFFLOAD_THRESHOLD', '2000'))
+
+_parse_executor: Optional[concurrent.futures.Executor] = None
+
+def get_parse_executor() -> Optional[concurrent.futures.Executor]:
+    """Lazily create the configured pool (``None`` means run inline)"""
+    global _parse_executor
+    if BOARD_PARSE_EXECUTOR == "inline":
+        return None
+    if _parse_executor is None:
+        if BOARD_PARSE_EXECUTOR == "thread":
+            _parse_executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=BOARD_PARSE_WORKERS, thread_name_prefix="board-parse"
+            )
+        else:
+            _parse_executor = concurrent.futures.ProcessPoolExecutor(max_workers=BOARD_PARSE_WORKERS)
+        logger.info(f"Started {BOARD_PARSE_EXECUTOR} pool with {BOARD_PARSE_WORKERS} workers for board parsing")
+    return _parse_executor
+
+def shutdown_parse_executor():
+    global _parse_executor
+    if _parse_executor is not None:
+        _parse_executor.shutdown(wait=False, cancel_futures=True)
+        _parse_executor = None
+
+def _chunks(items: list, size: int) -> List[list]:
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+def _map_note_chunk(frames: List[Frame], notes: List[StickyNote]) -> Dict[str, List[str]]:
+    """Map one chunk of notes, returning note ids so results stay small to transfer"""
+    return {frame_id: [note.id for note in mapped] for frame_id, mapped in map_notes_to_frames(frames, notes).items()}
+
+async def parse_board_items_offloaded(all_items: List[dict], types: Optional[List[str]] = None):
+    """``parse_board_items`` with the content pass spread over the parse pool in chunks"""
+    executor = get_parse_executor()
+    if executor is None or len(all_items) < BOARD_PARSE_OFFLOAD_THRESHOLD:
+        return parse_board_items(all_items, types)
+    
+    # Frames are few and cheap to parse; only the content pass is worth shipping to the pool
+    frames, frame_map = parse_frames([item for item in all_items if item.get("type") == FRAME_ITEM_TYPE])
+    logger.info(f"Found {len(frames)} frames")
+    
+    loop = asyncio.get_running_loop()
+    chunks = _chunks(all_items, BOARD_PARSE_CHUNK_SIZE)
+    parsed = await asyncio.gather(*(
+        loop.run_in_executor(executor, parse_content_items, chunk, frame_map, types)
+        for chunk in chunks
+    ))
+    sticky_notes = [note for notes in parsed for note in notes]
+    
+    if types is not None and FRAME_ITEM_TYPE not in types:
+        frames = []
+    
+    return frames, sticky_notes
+
+async def map_notes_to_frames_offloaded(frames: List[Frame], notes: List[StickyNote]) -> dict:
+    """``map_notes_to_frames`` with the notes spread over the parse pool in chunks"""
+    executor = get_parse_executor()
+    if executor is None or len(notes) < BOARD_PARSE_OFFLOAD_THRESHOLD:
+        return map_notes_to_frames(frames, notes)
+    
+    loop = asyncio.get_running_loop()
+    mapped_chunks = await asyncio.gather(*(
+        loop.run_in_executor(executor, _map_note_chunk, frames, chunk)
+        for chunk in _chunks(notes, BOARD_PARSE_CHUNK_SIZE)
+    ))
+    
+    notes_by_id = {note.id: note for note in notes}
+    frame_notes = {frame.id: [] for frame in frames}
+    for mapped in mapped_chunks:
+        for frame_id, note_ids in mapped.items():
+            frame_notes[frame_id].extend(notes_by_id[note_id] for note_id in note_ids)
+    return frame_notes
+
+# ==================== COLUMNAR WIRE FORMAT ====================
+
+BOARD_FORMAT_PATTERN = "^(object|columnar)$"
+
+def board_to_columnar(board: MiroBoard, frame_notes: Optional[dict] = None) -> dict:
+    """Encode a board as parallel arrays instead of one object per item.
+
+    Colors are replaced by small integer codes into a shared ``colors`` list and
+    frame membership is sent as lists of indices into the ``sticky_notes`` arrays.
+    """
+    colors: List[str] = []
+    color_codes: Dict[str, int] = {}
+    for note in board.sticky_notes:
+        if note.color not in color_codes:
+            color_codes[note.color] = len(colors)
+            colors.append(note.color)
+
+    note_index = {note.id: i for i, note in enumerate(board.sticky_notes)}
+    if frame_notes is None:
+        frame_notes = map_notes_to_frames(board.frames, board.sticky_notes)
+
+    return {
+        "format": "columnar",
+        "id": board.id,
+        "name": board.name,
+        "colors": colors,
+        "frames": {
+            "id": [f.id for f in board.frames],
+            "title": [f.title for f in board.frames],
+            "x": [f.x for f in board.frames],
+            "y": [f.y for f in board.frames],
+            "width": [f.width for f in board.frames],
+            "height": [f.height for f in board.frames],
+            "notes": [[note_index[n.id] for n in frame_notes[f.id]] for f in board.frames],
+        },
+        "sticky_notes": {
+            "id": [n.id for n in board.sticky_notes],
+            "text": [n.text for n in board.sticky_notes],
+            "x": [n.x for n in board.sticky_notes],
+            "y": [n.y for n in board.sticky_notes],
+            "width": [n.width for n in board.sticky_notes],
+            "height": [n.height for n in board.sticky_notes],
+            "color": [color_codes[n.color] for n in board.sticky_notes],
+        },
+        # Assets are few per board, they stay in object form
+        "assets": [asset.model_dump() for asset in board.assets],
+    }
+
+def board_from_columnar(data: dict) -> MiroBoard:
+    """Decode a columnar payload back into the object form"""
+    frames = data["frames"]
+    notes = data["sticky_notes"]
+    colors = data["colors"]
+    return MiroBoard(
+        id=data["id"],
+        name=data["name"],
+        frames=[
+            Frame(id=frames["id"][i], title=frames["title"][i], x=frames["x"][i],
+                  y=frames["y"][i], width=frames["width"][i], height=frames["height"][i])
+            for i in range(len(frames["id"]))
+        ],
+        sticky_notes=[
+            StickyNote(id=notes["id"][i], text=notes["text"][i], x=notes["x"][i],
+                       y=notes["y"][i], width=notes["width"][i], height=notes["height"][i],
+                       color=colors[notes["color"][i]])
+            for i in range(len(notes["id"]))
+        ],
+        assets=[BoardAsset(**asset) for asset in data.get("assets", [])],
+    )
+
+# ==================== BOARD QUERY FILTERS ====================
+
+BOARD_ITEM_FIELDS = sorted(set(Frame.model_fields) | set(StickyNote.model_fields))
+
+def _split_csv(value: Optional[str]) -> Optional[List[str]]:
+    if value is None:
+        return None
+    return [part.strip() for part in value.split(",") if part.strip()]
+
+def parse_board_filters(fields: Optional[str], frame_ids: Optional[str], types: Optional[str]):
+    """Parse the comma-separated ``fields``, ``frame_ids`` and ``types`` query parameters"""
+    field_list = _split_csv(fields)
+    frame_id_list = _split_csv(frame_ids)
+    type_list = _split_csv(types)
+    
+    unknown_fields = [f for f in field_list or [] if f not in BOARD_ITEM_FIELDS]
+    if unknown_fields:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown_fields)}")
+    unknown_types = [t for t in type_list or [] if t not in BOARD_ITEM_TYPES]
+    if unknown_types:
+        raise HTTPException(status_code=400, detail=f"Unknown item types: {', '.join(unknown_types)}")
+    
+    return field_list, frame_id_list, type_list
+
+def filter_board(board: MiroBoard, frame_ids: Optional[List[str]] = None, types: Optional[List[str]] = None) -> MiroBoard:
+    """Restrict an already loaded board to some frames and item types"""
+    frames = board.frames
+    notes = board.sticky_notes
+    assets = board.assets
+    
+    if frame_ids:
+        # Map against every frame so overlapping frames resolve exactly as in a full load
+        frame_notes = map_notes_to_frames(board.frames, notes)
+        frame_assets = map_notes_to_frames(board.frames, assets)
+        frames = [frame for frame in frames if frame.id in frame_ids]
+        notes = [note for frame in frames for note in frame_notes[frame.id]]
+        assets = [asset for frame in frames for asset in frame_assets[frame.id]]
+    if types is not None:
+        if FRAME_ITEM_TYPE not in types:
+            frames = []
+        # Loaded notes no longer carry their Miro type, they all count as sticky notes
+        if "sticky_note" not in types:
+            notes = []
+        assets = [asset for asset in assets if asset.type in types]
+    
+    return MiroBoard(id=board.id, name=board.name, frames=frames, sticky_notes=notes, assets=assets)
+
+def render_board(board: MiroBoard, format: str, fields: Optional[List[str]] = None, frame_notes: Optional[dict] = None):
+    """Return the board in the requested wire format, keeping only ``fields`` per item"""
+    if format == "columnar":
+        data = board_to_columnar(board, frame_notes)
+        if fields:
+            for section in ("frames", "sticky_notes"):
+                data[section] = {
+                    key: column for key, column in data[section].items()
+                    if key in fields or key in ("id", "notes")
+                }
+            if "color" not in fields:
+                del data["colors"]
+        return data
+    if fields:
+        keep = set(fields) | {"id"}
+        return {
+            "id": board.id,
+            "name": board.name,
+            "frames": [frame.model_dump(include=keep) for frame in board.frames],
+            "sticky_notes": [note.model_dump(include=keep) for note in board.sticky_notes],
+            "assets": [asset.model_dump(include=keep | {"type"}) for asset in board.assets],
+        }
+    return board
+
+# ==================== BOARD SNAPSHOTS ====================
+
+# Shared secret expected as ?secret= on the webhook callback URL registered with Miro.
+# Webhook events are refused while it is unset.
+MIRO_WEBHOOK_SECRET = os.environ.get('MIRO_WEBHOOK_SECRET')
+# How long a full load may be served from its snapshot before Miro is asked again (0 disables)
+BOARD_SNAPSHOT_TTL_SECONDS = float(os.environ.get('BOARD_SNAPSHOT_TTL_SECONDS', '60'))
+
+WEBHOOK_EVENT_TYPES = ("create", "update", "delete")
+
+class BoardSnapshot:
+    """Parsed board kept in memory and patched in place from Miro webhook events.
+
+    Alongside the parsed frames and notes it keeps the raw items (child
+    coordinates must be re-resolved when a frame moves) and the note-to-frame
+    mapping, so each event only re-maps the frames it touches.
+    """
+
+    def __init__(self, board_id: str, name: str, items: List[dict], frames: List[Frame],
+                 notes: List[StickyNote], frame_notes: Dict[str, List[StickyNote]],
+                 assets: Optional[List[BoardAsset]] = None):
+        self.board_id = board_id
+        self.name = name
+        self.items: Dict[str, dict] = {item["id"]: item for item in items}
+        self.frames: Dict[str, Frame] = {frame.id: frame for frame in frames}
+        self.frame_map = {frame.id: frame.model_dump(exclude={"id"}) for frame in frames}
+        self.notes: Dict[str, StickyNote] = {note.id: note for note in notes}
+        self.assets: Dict[str, BoardAsset] = {asset.id: asset for asset in assets or []}
+        # frame id -> ordered set of note ids, note id -> frame id
+        self.members: Dict[str, Dict[str, None]] = {
+            frame.id: dict.fromkeys(note.id for note in frame_notes.get(frame.id, [])) for frame in frames
+        }
+        self.note_frame: Dict[str, str] = {
+            note_id: frame_id for frame_id, note_ids in self.members.items() for note_id in note_ids
+        }
+        self.updated_at = datetime.now(timezone.utc).isoformat()
+        self.loaded_at = time.monotonic()
+
+    def is_fresh(self) -> bool:
+        """Webhook events only patch what Miro tells us about, so a snapshot expires regardless"""
+        return time.monotonic() - self.loaded_at < BOARD_SNAPSHOT_TTL_SECONDS
+
+    def to_board(self) -> MiroBoard:
+        return MiroBoard(
+            id=self.board_id,
+            name=self.name,
+            frames=list(self.frames.values()),
+            sticky_notes=list(self.notes.values()),
+            assets=list(self.assets.values())
+        )
+
+    def frame_notes(self) -> Dict[str, List[StickyNote]]:
+        return {frame_id: [self.notes[note_id] for note_id in note_ids] for frame_id, note_ids in self.members.items()}
+
+    def apply_event(self, event_type: str, item: dict) -> set:
+        """Apply one create/update/delete event and return the ids of the frames it changed"""
+        item_id = item["id"]
+        item_type = item.get("type") or self.items.get(item_id, {}).get("type")
+        self.updated_at = datetime.now(timezone.utc).isoformat()
+        
+        if event_type == "delete":
+            self.items.pop(item_id, None)
+            if item_id in self.frames:
+                return self._remove_frame(item_id)
+            if self.assets.pop(item_id, None) is not None:
+                return set()
+            return self._remove_note(item_id)
+        
+        # Update events may only carry the changed fields
+        item = {**self.items.get(item_id, {}), **item}
+        self.items[item_id] = item
+        if item_type == FRAME_ITEM_TYPE:
+            return self._upsert_frame(item)
+        if item_type in CONTENT_ITEM_TYPES:
+            return self._upsert_notes([item])
+        if item_type in ASSET_ITEM_TYPES:
+            self._upsert_assets([item])
+        return set()
+
+    def _children(self, frame_id: str) -> List[dict]:
+        return [item for item in self.items.values() if (item.get("parent") or {}).get("id") == frame_id]
+
+    def _remap(self, note_ids) -> set:
+        """Re-run the spatial mapping for some notes only"""
+        affected = set()
+        for note_id in note_ids:
+            old_frame = self.note_frame.pop(note_id, None)
+            if old_frame is not None:
+                self.members[old_frame].pop(note_id, None)
+                affected.add(old_frame)
+        
+        notes = [self.notes[note_id] for note_id in note_ids if note_id in self.notes]
+        for frame_id, mapped in map_notes_to_frames(list(self.frames.values()), notes).items():
+            for note in mapped:
+                self.members[frame_id][note.id] = None
+                self.note_frame[note.id] = frame_id
+                affected.add(frame_id)
+        return affected
+
+    def _upsert_notes(self, items: List[dict]) -> set:
+        parsed = {note.id: note for note in parse_content_items(items, self.frame_map)}
+        for item in items:
+            if item["id"] in parsed:
+                self.notes[item["id"]] = parsed[item["id"]]
+            else:
+                # Content was cleared, the item no longer yields a note
+                self.notes.pop(item["id"], None)
+        return self._remap([item["id"] for item in items])
+
+    def _upsert_assets(self, items: List[dict]):
+        for asset in parse_asset_items(items, self.frame_map):
+            self.assets[asset.id] = asset
+
+    def _remove_note(self, note_id: str) -> set:
+        if note_id not in self.notes:
+            return set()
+        del self.notes[note_id]
+        return self._remap([note_id])
+
+    def _upsert_frame(self, item: dict) -> set:
+        frames, frame_map = parse_frames([item])
+        frame = frames[0]
+        self.frames[frame.id] = frame
+        self.frame_map[frame.id] = frame_map[frame.id]
+        self.members.setdefault(frame.id, {})
+        
+        # Children move with the frame; loose notes may now fall inside it
+        children = self._children(frame.id)
+        affected = self._upsert_notes(children) if children else set()
+        self._upsert_assets(children)
+        inside = [
+            note.id for note in self.notes.values()
+            if frame.x <= note.x + note.width / 2 <= frame.x + frame.width
+            and frame.y <= note.y + note.height / 2 <= frame.y + frame.height
+        ]
+        return affected | self._remap(list(self.members[frame.id]) + inside) | {frame.id}
+
+    def _remove_frame(self, frame_id: str) -> set:
+        del self.frames[frame_id]
+        del self.frame_map[frame_id]
+        orphans = list(self.members.pop(frame_id))
+        for note_id in orphans:
+            self.note_frame.pop(note_id, None)
+        
+        # Without the frame, child positions are read as absolute like any unparented item
+        children = self._children(frame_id)
+        affected = self._upsert_notes(children) if children else set()
+        self._upsert_assets(children)
+        return (affected | self._remap(orphans) | {frame_id})
+
+# Parsed snapshots of fully loaded boards, keyed by board id
+board_snapshots: Dict[str, BoardSnapshot] = {}
+
+def fresh_snapshot(board_id: str) -> Optional[BoardSnapshot]:
+    """The board's snapshot if it is still within BOARD_SNAPSHOT_TTL_SECONDS"""
+    snapshot = board_snapshots.get(board_id)
+    if snapshot is not None and not snapshot.is_fresh():
+        del board_snapshots[board_id]
+        return None
+    return snapshot
+
+# ==================== ASSET CACHE ====================
+
+ASSET_CACHE_DIR = Path(os.environ.get('ASSET_CACHE_DIR', str(ROOT_DIR / 'asset_cache')))
+ASSET_CACHE_MAX_BYTES = int(os.environ.get('ASSET_CACHE_MAX_BYTES', str(512 * 1024 * 1024)))
+ASSET_DOWNLOAD_CONCURRENCY = int(os.environ.get('ASSET_DOWNLOAD_CONCURRENCY', '8'))
+ASSET_MAX_REDIRECTS = int(os.environ.get('ASSET_MAX_REDIRECTS', '5'))
+
+class AssetCache:
+    """Content-addressed file cache for downloaded board assets.
+
+    Files are stored under their SHA-256. A small JSON index maps each source
+    (board, item and Miro version) to its hash, so a repeat export finds the file
+    without downloading it again. ``files`` is kept in least recently used order
+    with a running byte total, and the oldest files are evicted once the cache
+    grows past ``max_bytes``. Lookups and stores run in worker threads and
+    share one lock.
+    """
+
+    def __init__(self, root: Path, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.index_path = root / "index.json"
+        self._lock = threading.Lock()
+        self.sources: Dict[str, str] = {}
+        self.files: "OrderedDict[str, dict]" = OrderedDict()
+        self.total_bytes = 0
+        if self.index_path.exists():
+            try:
+                index = json.loads(self.index_path.read_text())
+                self.sources = index.get("sources", {})
+                # The index is saved in least recently used order; drop files that are gone
+                self.files = OrderedDict(
+                    (content_hash, meta) for content_hash, meta in index.get("files", {}).items()
+                    if self.path_for(content_hash).exists()
+                )
+                self.sources = {key: value for key, value in self.sources.items() if value in self.files}
+                self.total_bytes = sum(meta.get("size", 0) for meta in self.files.values())
+            except (OSError, ValueError) as e:
+                logger.warning(f"Ignoring unreadable asset cache index: {e}")
+
+    def path_for(self, content_hash: str) -> Path:
+        return self.root / content_hash[:2] / content_hash
+
+    def lookup(self, source_key: str) -> Optional[str]:
+        """Hash of a cached source, marking it as recently used"""
+        with self._lock:
+            content_hash = self.sources.get(source_key)
+            if content_hash is None:
+                return None
+            if content_hash not in self.files or not self.path_for(content_hash).exists():
+                self.sources.pop(source_key, None)
+                self._forget(content_hash)
+                return None
+            self.files.move_to_end(content_hash)
+            return content_hash
+
+    def store(self, source_key: str, content: bytes, content_type: Optional[str]) -> str:
+        content_hash = hashlib.sha256(content).hexdigest()
+        path = self.path_for(content_hash)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Written outside the lock under a name no other store uses
+        tmp_path = path.with_name(f"{content_hash}.{uuid.uuid4().hex}.tmp")
+        tmp_path.write_bytes(content)
+        with self._lock:
+            tmp_path.replace(path)
+            if content_hash not in self.files:
+                self.total_bytes += len(content)
+            self.sources[source_key] = content_hash
+            self.files[content_hash] = {"content_type": content_type, "size": len(content)}
+            self.files.move_to_end(content_hash)
+            self._evict()
+            self._save_index()
+        return content_hash
+
+    def evict(self):
+        """Delete least recently used files until the cache fits in ``max_bytes``"""
+        with self._lock:
+            self._evict()
+
+    def _forget(self, content_hash: str):
+        meta = self.files.pop(content_hash, None)
+        if meta is not None:
+            self.total_bytes -= meta.get("size", 0)
+
+    def _evict(self):
+        evicted = False
+        while self.total_bytes > self.max_bytes and len(self.files) > 1:
+            content_hash, meta = next(iter(self.files.items()))
+            self.path_for(content_hash).unlink(missing_ok=True)
+            self._forget(content_hash)
+            evicted = True
+            logger.info(f"Evicted asset {content_hash} ({meta.get('size', 0)} bytes) from cache")
+        if evicted:
+            self.sources = {key: value for key, value in self.sources.items() if value in self.files}
+
+    def _save_index(self):
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.index_path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps({"sources": self.sources, "files": self.files}))
+        tmp_path.replace(self.index_path)
+
+asset_cache = AssetCache(ASSET_CACHE_DIR, ASSET_CACHE_MAX_BYTES)
+
+def is_miro_api_url(url: str) -> bool:
+    return url.startswith(f"{MIRO_API_BASE}/")
+
+async def resolve_host(host: str) -> List[str]:
+    infos = await asyncio.get_running_loop().getaddrinfo(host, 443, type=socket.SOCK_STREAM)
+    return [info[4][0] for info in infos]
+
+async def ensure_public_url(url: httpx.URL):
+    """Refuse anything but https to public addresses.
+
+    Asset URLs come from board content anyone with edit access controls, and the
+    downloaded bytes are served back from /api/assets, so internal and metadata
+    addresses must never be fetched.
+    """
+    if url.scheme != "https":
+        raise ValueError(f"Refusing to fetch non-https asset URL {url}")
+    try:
+        addresses = [ipaddress.ip_address(url.host)]
+    except ValueError:
+        addresses = [ipaddress.ip_address(address.split("%")[0]) for address in await resolve_host(url.host)]
+    if not addresses or not all(address.is_global for address in addresses):
+        raise ValueError(f"Refusing to fetch asset from non-public address {url.host}")
+
+async def fetch_public_asset(http_client: httpx.AsyncClient, request: httpx.Request) -> httpx.Response:
+    """Send ``request``, following redirects by hand so every hop is checked"""
+    for _ in range(ASSET_MAX_REDIRECTS + 1):
+        await ensure_public_url(request.url)
+        response = await http_client.send(request)
+        if response.next_request is None:
+            return response
+        # httpx drops the Authorization header when the redirect changes origin
+        request = response.next_request
+    raise ValueError(f"Too many redirects for asset URL {request.url}")
+
+async def download_asset(http_client: httpx.AsyncClient, access_token: str, board_id: str, asset: BoardAsset,
+                         miro_client: Optional[httpx.AsyncClient] = None) -> BoardAsset:
+    """Fetch one asset into the cache unless this version is already there.
+
+    Miro API URLs go through ``miro_client`` (the breaker-guarded client when
+    given); file hosts, signed redirects and thumbnails use plain ``http_client``
+    so their failures do not open the Miro breaker, and must be public https URLs.
+    """
+    if not asset.source_url:
+        return asset
+    
+    source_key = f"{board_id}/{asset.id}@{asset.version or asset.source_url}"
+    content_hash = await asyncio.to_thread(asset_cache.lookup, source_key)
+    if content_hash is None:
+        try:
+            if is_miro_api_url(asset.source_url):
+                response = await (miro_client or http_client).get(
+                    asset.source_url,
+                    headers={"Authorization": f"Bearer {access_token}"}
+                )
+                if response.next_request is not None:
+                    # Signed file URL
+                    response = await fetch_public_asset(http_client, response.next_request)
+            else:
+                # Embed thumbnails live on third-party hosts and never get the user's token
+                response = await fetch_public_asset(http_client, http_client.build_request("GET", asset.source_url))
+            response.raise_for_status()
+            # Miro resource endpoints answer with a JSON pointer to the actual file
+            pointer = response.json() if response.headers.get("content-type", "").startswith("application/json") else None
+            if isinstance(pointer, dict) and isinstance(pointer.get("url"), str):
+                response = await fetch_public_asset(http_client, http_client.build_request("GET", pointer["url"]))
+                response.raise_for_status()
+            content_type = response.headers.get("content-type")
+            content_hash = await asyncio.to_thread(asset_cache.store, source_key, response.content, content_type)
+        except (httpx.HTTPError, ValueError, OSError) as e:
+            logger.error(f"Failed to download asset {asset.id} from board {board_id}: {str(e)}")
+            return asset
+    
+    meta = asset_cache.files.get(content_hash, {})
+    return asset.model_copy(update={
+        "content_hash": content_hash,
+        "content_type": meta.get("content_type"),
+        "size": meta.get("size")
+    })
+
+async def download_board_assets(board_id: str, assets: List[BoardAsset]) -> List[BoardAsset]:
+    """Download a board's assets concurrently, at most ASSET_DOWNLOAD_CONCURRENCY at a time"""
+    if not assets:
+        return []
+    access_token = token_store.get("default", {}).get("access_token", "")
+    async with miro_http_client() as miro_client, httpx.AsyncClient() as http_client:
+        return await run_bounded(
+            assets,
+            lambda asset: download_asset(http_client, access_token, board_id, asset, miro_client=miro_client),
+            ASSET_DOWNLOAD_CONCURRENCY
+        )
+
+def group_assets_by_frame(frames: List[Frame], assets: List[BoardAsset]) -> Dict[str, List[dict]]:
+    """Frame id -> assets inside it, each with the URL it is served from"""
+    return {
+        frame_id: [
+            {**asset.model_dump(), "url": f"/api/assets/{asset.content_hash}" if asset.content_hash else None}
+            for asset in frame_assets
+        ]
+        for frame_id, frame_assets in map_notes_to_frames(frames, assets).items()
+    }
+
+# ==================== BOARD PREFETCH ====================
+
+# How many of the most recently modified boards to warm after listing boards (0 disables)
+BOARD_PREFETCH_COUNT = int(os.environ.get('BOARD_PREFETCH_COUNT', '0'))
+BOARD_PREFETCH_CONCURRENCY = int(os.environ.get('BOARD_PREFETCH_CONCURRENCY', '1'))
+# Head start given to the request that listed the boards before prefetching begins
+BOARD_PREFETCH_DELAY_SECONDS = float(os.environ.get('BOARD_PREFETCH_DELAY_SECONDS', '0.5'))
+
+prefetch_tasks: Dict[str, asyncio.Task] = {}
+_prefetch_semaphore: Optional[asyncio.Semaphore] = None
+
+async def prefetch_board(board_id: str):
+    """Load one board into its snapshot, yielding to user requests"""
+    global _prefetch_semaphore
+    if _prefetch_semaphore is None:
+        _prefetch_semaphore = asyncio.Semaphore(BOARD_PREFETCH_CONCURRENCY)
+    
+    await asyncio.sleep(BOARD_PREFETCH_DELAY_SECONDS)
+    async with _prefetch_semaphore:
+        if fresh_snapshot(board_id) is not None:
+            return
+        try:
+            await load_miro_board(board_id)
+            logger.info(f"Prefetched board {board_id}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Prefetch of board {board_id} failed: {str(e)}")
+
+def _forget_prefetch(task: asyncio.Task):
+    for board_id, tracked in list(prefetch_tasks.items()):
+        if tracked is task:
+            del prefetch_tasks[board_id]
+
+def schedule_board_prefetch(boards: List[dict], count: int):
+    """Start background prefetches for the ``count`` most recently modified boards"""
+    if count <= 0:
+        return
+    recent = sorted(boards, key=lambda board: board.get("modifiedAt") or "", reverse=True)[:count]
+    for board in recent:
+        board_id = board.get("id")
+        if not board_id or fresh_snapshot(board_id) is not None:
+            continue
+        task = prefetch_tasks.get(board_id)
+        if task is not None and not task.done():
+            continue
+        task = asyncio.create_task(prefetch_board(board_id))
+        prefetch_tasks[board_id] = task
+        task.add_done_callback(_forget_prefetch)
+    logger.info(f"Prefetching {len(prefetch_tasks)} recent boards in the background")
+
+async def claim_prefetched_board(board_id: str):
+    """The user picked a board: cancel the other prefetches and wait for this one if it is running"""
+    own_task = prefetch_tasks.pop(board_id, None)
+    for other_id in list(prefetch_tasks):
+        prefetch_tasks.pop(other_id).cancel()
+    
+    if own_task is not None and not own_task.done():
+        # Half-loaded is better than starting over; wait() neither raises nor cancels it
+        await asyncio.wait({own_task})
+
 # ==================== MIRO OAUTH ENDPOINTS ====================
 
 @miro_router.get("/auth")
@@ -247,7 +1464,7 @@ async def miro_callback(code: str = Query(None), error: str = Query(None), state
         return RedirectResponse(url=redirect_target)
     
     try:
-        async with httpx.AsyncClient() as http_client:
+        async with miro_http_client() as http_client:
             response = await http_client.post(
                 MIRO_TOKEN_URL,
                 data={
@@ -288,42 +1505,87 @@ async def miro_status():
 @miro_router.post("/disconnect")
 async def miro_disconnect():
     """Disconnect from Miro"""
-    if "default" in token_store:
-        del token_store["default"]
+    token_store.pop("default", None)
+    board_snapshots.clear()
+    for task in prefetch_tasks.values():
+        task.cancel()
+    prefetch_tasks.clear()
     return {"status": "disconnected"}
 
 @miro_router.get("/boards")
-async def get_miro_boards():
-    """Get list of boards from Miro"""
+async def get_miro_boards(prefetch: Optional[int] = Query(None, ge=0)):
+    """Get list of boards from Miro.
+
+    With ``prefetch`` (or BOARD_PREFETCH_COUNT) the most recently modified boards
+    are loaded into snapshots in the background.
+    """
     if "default" not in token_store:
         raise HTTPException(status_code=401, detail="Not connected to Miro")
     
     access_token = token_store["default"]["access_token"]
     
     try:
-        async with httpx.AsyncClient() as http_client:
+        async with miro_http_client() as http_client:
             response = await http_client.get(
                 f"{MIRO_API_BASE}/boards",
                 headers={"Authorization": f"Bearer {access_token}"}
             )
             response.raise_for_status()
-            return response.json()
+            boards = response.json()
+            schedule_board_prefetch(boards.get("data", []), BOARD_PREFETCH_COUNT if prefetch is None else prefetch)
+            return boards
     except httpx.HTTPStatusError as e:
         if e.response.status_code == 401:
-            del token_store["default"]
+            token_store.pop("default", None)
             raise HTTPException(status_code=401, detail="Token expired, please reconnect")
         raise HTTPException(status_code=e.response.status_code, detail=str(e))
 
-@miro_router.get("/boards/{board_id}")
-async def get_miro_board_data(board_id: str):
+@miro_router.get("/boards/{board_id}", dependencies=[Depends(admission("board_load"))])
+async def get_miro_board_data(
+    board_id: str,
+    format: str = Query("object", pattern=BOARD_FORMAT_PATTERN),
+    fields: Optional[str] = Query(None),
+    frame_ids: Optional[str] = Query(None),
+    types: Optional[str] = Query(None),
+    refresh: bool = Query(False),
+):
     """Get board data with frames and sticky notes from Miro"""
+    await claim_prefetched_board(board_id)
+    return await load_miro_board(board_id, format, fields, frame_ids, types, refresh)
+
+async def load_miro_board(
+    board_id: str,
+    format: str = "object",
+    fields: Optional[str] = None,
+    frame_ids: Optional[str] = None,
+    types: Optional[str] = None,
+    refresh: bool = False,
+):
+    """Fetch and parse a board from Miro.
+
+    Loads without a type filter fetch the whole board and keep it as a snapshot
+    that webhook events keep current, so later loads without a type filter
+    within BOARD_SNAPSHOT_TTL_SECONDS are served from memory unless ``refresh``
+    is set. ``frame_ids`` is applied after parsing with the same positional
+    mapping as full loads.
+    """
     if "default" not in token_store:
         raise HTTPException(status_code=401, detail="Not connected to Miro")
     
+    field_list, frame_id_list, type_list = parse_board_filters(fields, frame_ids, types)
+    full_load = type_list is None
+    
+    snapshot = fresh_snapshot(board_id)
+    if full_load and snapshot is not None and not refresh:
+        logger.info(f"Serving board {board_id} from snapshot updated at {snapshot.updated_at}")
+        if frame_id_list:
+            return render_board(filter_board(snapshot.to_board(), frame_id_list), format, field_list)
+        return render_board(snapshot.to_board(), format, field_list, snapshot.frame_notes())
+    
     access_token = token_store["default"]["access_token"]
     
     try:
-        async with httpx.AsyncClient() as http_client:
+        async with miro_http_client() as http_client:
             # Get board info
             board_response = await http_client.get(
                 f"{MIRO_API_BASE}/boards/{board_id}",
@@ -332,176 +1594,132 @@ async def get_miro_board_data(board_id: str):
             board_response.raise_for_status()
             board_info = board_response.json()
             
-            # Fetch ALL items with pagination
-            all_items = []
-            cursor = None
-            
-            while True:
-                params = {"limit": 50}
-                if cursor:
-                    params["cursor"] = cursor
-                
-                items_response = await http_client.get(
-                    f"{MIRO_API_BASE}/boards/{board_id}/items",
-                    headers={"Authorization": f"Bearer {access_token}"},
-                    params=params
-                )
-                items_response.raise_for_status()
-                items_data = items_response.json()
-                
-                all_items.extend(items_data.get("data", []))
-                
-                cursor = items_data.get("cursor")
-                if not cursor:
-                    break
+            all_items = await fetch_filtered_board_items(http_client, board_id, access_token, types=type_list)
             
             logger.info(f"Fetched {len(all_items)} total items from board {board_id}")
             
-            # First pass: collect frames and their positions
-            frames = []
-            frame_map = {}  # id -> frame data with absolute position
-            
-            for item in all_items:
-                item_type = item.get("type")
-                if item_type == "frame":
-                    frame_id = item["id"]
-                    frame_x = item.get("position", {}).get("x", 0)
-                    frame_y = item.get("position", {}).get("y", 0)
-                    frame_width = item.get("geometry", {}).get("width", 600)
-                    frame_height = item.get("geometry", {}).get("height", 400)
-                    
-                    frame = Frame(
-                        id=frame_id,
-                        title=item.get("data", {}).get("title", "Untitled Frame"),
-                        x=frame_x,
-                        y=frame_y,
-                        width=frame_width,
-                        height=frame_height
-                    )
-                    frames.append(frame)
-                    frame_map[frame_id] = {
-                        "frame": frame,
-                        "x": frame_x,
-                        "y": frame_y,
-                        "width": frame_width,
-                        "height": frame_height
-                    }
-            
-            logger.info(f"Found {len(frames)} frames")
-            
-            # Second pass: collect content items and handle parent relationships
-            sticky_notes = []
+            frames, sticky_notes = await parse_board_items_offloaded(all_items, types=type_list)
+            all_frames, frame_map = parse_frames([item for item in all_items if item.get("type") == FRAME_ITEM_TYPE])
+            assets = parse_asset_items(all_items, frame_map, types=type_list)
             
-            def extract_content(item):
-                """Extract text content from various item types"""
-                item_type = item.get("type")
-                content = ""
-                
-                if item_type == "sticky_note":
-                    content = item.get("data", {}).get("content", "")
-                elif item_type == "text":
-                    content = item.get("data", {}).get("content", "")
-                elif item_type == "shape":
-                    content = item.get("data", {}).get("content", "")
-                elif item_type == "card":
-                    title = item.get("data", {}).get("title", "")
-                    desc = item.get("data", {}).get("description", "")
-                    content = f"{title}: {desc}" if title and desc else title or desc
-                
-                # Strip HTML tags
-                import re
-                return re.sub(r'<[^>]+>', '', content).strip()
-            
-            def get_color(item):
-                """Get color from item style"""
-                fill_color = item.get("style", {}).get("fillColor", "yellow")
-                color_map = {
-                    "light_yellow": "yellow", "yellow": "yellow",
-                    "light_blue": "blue", "blue": "blue",
-                    "light_green": "green", "green": "green",
-                    "light_pink": "pink", "pink": "pink",
-                    "violet": "pink", "cyan": "blue", "orange": "yellow",
-                    "gray": "yellow", "dark_blue": "blue",
-                    "dark_green": "green", "red": "pink"
-                }
-                return color_map.get(fill_color, "yellow")
-            
-            for item in all_items:
-                item_type = item.get("type")
-                
-                # Skip frames and non-content items
-                if item_type in ["frame", "image", "document", "embed", "preview"]:
-                    continue
-                
-                content = extract_content(item)
-                if not content:
-                    continue
-                
-                # Get position - check if item has a parent (is inside a frame)
-                parent_id = item.get("parent", {}).get("id") if item.get("parent") else None
-                item_x = item.get("position", {}).get("x", 0)
-                item_y = item.get("position", {}).get("y", 0)
-                
-                # If item is inside a frame, its coordinates are RELATIVE to the frame
-                # Convert to absolute coordinates for mapping
-                if parent_id and parent_id in frame_map:
-                    parent_frame = frame_map[parent_id]
-                    # Item position is relative to frame center, convert to absolute
-                    abs_x = parent_frame["x"] + item_x
-                    abs_y = parent_frame["y"] + item_y
-                    logger.info(f"Item '{content[:30]}' is child of frame '{parent_frame['frame'].title}', relative pos ({item_x}, {item_y}), absolute ({abs_x}, {abs_y})")
-                else:
-                    abs_x = item_x
-                    abs_y = item_y
-                
-                sticky_notes.append(StickyNote(
-                    id=item["id"],
-                    text=content,
-                    x=abs_x,
-                    y=abs_y,
-                    width=item.get("geometry", {}).get("width", 150),
-                    height=item.get("geometry", {}).get("height", 100),
-                    color=get_color(item)
-                ))
-                logger.info(f"Added content item: '{content[:50]}' at ({abs_x}, {abs_y})")
-            
-            logger.info(f"Parsed {len(frames)} frames and {len(sticky_notes)} content items")
+            logger.info(f"Parsed {len(frames)} frames, {len(sticky_notes)} content items and {len(assets)} assets")
             
             # Debug: log frame boundaries
             for frame in frames:
                 logger.info(f"Frame '{frame.title}': x={frame.x}, y={frame.y}, w={frame.width}, h={frame.height}")
             
-            return MiroBoard(
+            board = MiroBoard(
                 id=board_id,
                 name=board_info.get("name", "Untitled Board"),
                 frames=frames,
-                sticky_notes=sticky_notes
+                sticky_notes=sticky_notes,
+                assets=assets
             )
+            if full_load:
+                frame_notes = await map_notes_to_frames_offloaded(frames, sticky_notes)
+                board_snapshots[board_id] = BoardSnapshot(board_id, board.name, all_items, frames, sticky_notes, frame_notes, assets)
+                if not frame_id_list:
+                    return render_board(board, format, field_list, frame_notes)
+            
+            if frame_id_list:
+                # Membership needs every frame's bounds, even when frames are filtered out of the result
+                board = filter_board(board.model_copy(update={"frames": all_frames}), frame_id_list)
+                if type_list is not None and FRAME_ITEM_TYPE not in type_list:
+                    board.frames = []
+            return render_board(board, format, field_list)
     except httpx.HTTPStatusError as e:
         logger.error(f"Miro API error: {e.response.status_code} - {e.response.text}")
         if e.response.status_code == 401:
-            del token_store["default"]
+            token_store.pop("default", None)
             raise HTTPException(status_code=401, detail="Token expired, please reconnect")
         raise HTTPException(status_code=e.response.status_code, detail=str(e))
 
+@miro_router.post("/webhook")
+async def miro_webhook(request: Request, secret: Optional[str] = Query(None)):
+    """Receive Miro board item events and patch the board's snapshot in place"""
+    if not MIRO_WEBHOOK_SECRET:
+        raise HTTPException(status_code=403, detail="Webhooks are disabled, MIRO_WEBHOOK_SECRET is not set")
+    if not hmac.compare_digest(secret or "", MIRO_WEBHOOK_SECRET):
+        raise HTTPException(status_code=403, detail="Invalid webhook secret")
+    
+    try:
+        payload = await request.json()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid JSON payload")
+    
+    if not isinstance(payload, dict):
+        raise HTTPException(status_code=400, detail="Expected a JSON object")
+    
+    # Subscription verification handshake
+    if "challenge" in payload:
+        return {"challenge": payload["challenge"]}
+    
+    event = payload.get("event", payload)
+    item = event.get("item") if isinstance(event, dict) else None
+    if not isinstance(item, dict):
+        raise HTTPException(status_code=400, detail="Expected an event object with an item object")
+    board_id = event.get("boardId")
+    event_type = event.get("type")
+    if not board_id or event_type not in WEBHOOK_EVENT_TYPES or not item.get("id"):
+        raise HTTPException(status_code=400, detail="Expected boardId, type (create/update/delete) and item.id")
+    
+    snapshot = fresh_snapshot(board_id)
+    if snapshot is None:
+        # Nothing loaded yet; the next full load will fetch a fresh copy
+        return {"status": "ignored", "board_id": board_id}
+    
+    affected = snapshot.apply_event(event_type, item)
+    logger.info(f"Webhook {event_type} of item {item['id']} on board {board_id}, re-mapped frames: {sorted(affected)}")
+    return {"status": "applied", "board_id": board_id, "affected_frames": sorted(affected)}
+
+@miro_router.get("/boards/{board_id}/assets", dependencies=[Depends(admission("board_load"))])
+async def get_miro_board_assets(board_id: str, frame_ids: Optional[str] = Query(None)):
+    """Download a board's images, documents and embed previews into the asset cache, grouped by frame"""
+    await claim_prefetched_board(board_id)
+    board = await load_miro_board(board_id, frame_ids=frame_ids)
+    assets = await download_board_assets(board_id, board.assets)
+    by_frame = group_assets_by_frame(board.frames, assets)
+    framed = {asset["id"] for frame_assets in by_frame.values() for asset in frame_assets}
+    
+    return {
+        "board_id": board_id,
+        "frames": [
+            {"frame_id": frame.id, "frame_title": frame.title, "assets": by_frame[frame.id]}
+            for frame in board.frames
+        ],
+        "unframed_assets": [
+            {**asset.model_dump(), "url": f"/api/assets/{asset.content_hash}" if asset.content_hash else None}
+            for asset in assets if asset.id not in framed
+        ]
+    }
+
 # ==================== ORIGINAL ENDPOINTS ====================
 
 @api_router.get("/")
 async def root():
     return {"message": "MiroBridge API - AI-Powered Miro to PowerPoint Export"}
 
-@api_router.get("/board", response_model=MiroBoard)
-async def get_mock_board():
+@api_router.get("/board")
+async def get_mock_board(
+    format: str = Query("object", pattern=BOARD_FORMAT_PATTERN),
+    fields: Optional[str] = Query(None),
+    frame_ids: Optional[str] = Query(None),
+    types: Optional[str] = Query(None),
+):
     """Get mock Miro board data with frames and sticky notes"""
-    return MOCK_MIRO_BOARD
+    field_list, frame_id_list, type_list = parse_board_filters(fields, frame_ids, types)
+    board = filter_board(MOCK_MIRO_BOARD, frame_id_list, type_list)
+    return render_board(board, format, field_list)
 
 @api_router.get("/board/mapped")
-async def get_mapped_board():
+async def get_mapped_board(frame_ids: Optional[str] = Query(None)):
     """Get board data with notes mapped to frames"""
-    frame_notes = map_notes_to_frames(MOCK_MIRO_BOARD.frames, MOCK_MIRO_BOARD.sticky_notes)
+    _, frame_id_list, _ = parse_board_filters(None, frame_ids, None)
+    board = filter_board(MOCK_MIRO_BOARD, frame_id_list)
+    frame_notes = map_notes_to_frames(board.frames, board.sticky_notes)
     
     result = []
-    for frame in MOCK_MIRO_BOARD.frames:
+    for frame in board.frames:
         notes = frame_notes.get(frame.id, [])
         result.append({
             "frame": frame.model_dump(),
@@ -515,27 +1733,408 @@ async def get_mapped_board():
         "frames_with_notes": result
     }
 
+@api_router.get("/assets/{content_hash}")
+async def get_cached_asset(content_hash: str):
+    """Serve a downloaded asset from the content-addressed cache"""
+    if not re.fullmatch(r"[0-9a-f]{64}", content_hash):
+        raise HTTPException(status_code=400, detail="Invalid asset hash")
+    path = asset_cache.path_for(content_hash)
+    if not path.exists():
+        raise HTTPException(status_code=404, detail="Asset not in cache")
+    meta = asset_cache.files.get(content_hash, {})
+    return FileResponse(path, media_type=meta.get("content_type") or "application/octet-stream")
+
+@api_router.get("/status")
+async def get_status():
+    """Report upstream circuit breaker states and per-endpoint admission queues"""
+    return {
+        "breakers": {
+            "miro": miro_breaker.status(),
+            "groq": groq_breaker.status()
+        },
+        "admission": {name: controller.status() for name, controller in admission_controllers.items()}
+    }
+
 @api_router.get("/templates")
 async def get_templates():
     """Get available slide templates"""
     return {"templates": SLIDE_TEMPLATES}
 
-@api_router.post("/summarize", response_model=SlideContent)
-async def summarize_frame_content(request: SummarizeRequest):
-    """Use AI to summarize sticky note content into premium editorial slide format"""
+# ==================== PROMPT COMPACTION ====================
+
+# Approximate token budget for the notes block of a summarization prompt
+PROMPT_TOKEN_BUDGET = int(os.environ.get('PROMPT_TOKEN_BUDGET', '2000'))
+# Estimated Jaccard similarity above which two notes count as the same idea
+NOTE_SIMILARITY_THRESHOLD = float(os.environ.get('NOTE_SIMILARITY_THRESHOLD', '0.8'))
+
+MINHASH_PERMUTATIONS = 32
+MINHASH_BANDS = 8
+_MINHASH_PRIME = (1 << 61) - 1
+_MINHASH_SEEDS = [
+    (1 + 2 * i * 0x9E3779B1 % _MINHASH_PRIME, 7 + i * 0x85EBCA77 % _MINHASH_PRIME)
+    for i in range(MINHASH_PERMUTATIONS)
+]
+
+class WeightedNote(BaseModel):
+    text: str
+    weight: int = 1
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token)"""
+    return max(1, len(text) // 4)
+
+def normalize_note(text: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace"""
+    return " ".join(re.sub(r"[^\w\s]", " ", text.lower()).split())
+
+def minhash_signature(text: str) -> List[int]:
+    """MinHash signature over the character 4-gram shingles of a normalized note"""
+    padded = f" {text} "
+    shingles = {padded[i:i + 4] for i in range(max(1, len(padded) - 3))}
+    hashes = [zlib.crc32(shingle.encode()) for shingle in shingles]
+    return [min((a * h + b) % _MINHASH_PRIME for h in hashes) for a, b in _MINHASH_SEEDS]
+
+def collapse_near_duplicates(notes: List[str], threshold: float = None) -> List[WeightedNote]:
+    """Merge notes whose MinHash similarity reaches ``threshold``, counting merges as weight.
+
+    Candidates are found with LSH banding, so each note is only compared with
+    notes that share at least one band of its signature.
+    """
+    threshold = NOTE_SIMILARITY_THRESHOLD if threshold is None else threshold
+    rows = MINHASH_PERMUTATIONS // MINHASH_BANDS
+    clusters: List[WeightedNote] = []
+    signatures: List[List[int]] = []
+    buckets: Dict[tuple, List[int]] = {}
+    
+    for note in notes:
+        normalized = normalize_note(note)
+        if not normalized:
+            continue
+        signature = minhash_signature(normalized)
+        bands = [(band, tuple(signature[band * rows:(band + 1) * rows])) for band in range(MINHASH_BANDS)]
+        
+        match = None
+        for candidate in sorted({i for key in bands for i in buckets.get(key, [])}):
+            agreement = sum(x == y for x, y in zip(signature, signatures[candidate])) / MINHASH_PERMUTATIONS
+            if agreement >= threshold:
+                match = candidate
+                break
+        
+        if match is not None:
+            clusters[match].weight += 1
+            continue
+        
+        clusters.append(WeightedNote(text=note.strip()))
+        signatures.append(signature)
+        for key in bands:
+            buckets.setdefault(key, []).append(len(clusters) - 1)
+    
+    return clusters
+
+def format_prompt_note(note: WeightedNote) -> str:
+    return f"- {note.text} (x{note.weight})" if note.weight > 1 else f"- {note.text}"
+
+def compact_notes(notes: List[str], token_budget: int = None):
+    """Collapse near-duplicate notes and trim them to the token budget, heaviest first.
+
+    Returns the kept notes and the estimated number of prompt tokens saved.
+    """
+    token_budget = PROMPT_TOKEN_BUDGET if token_budget is None else token_budget
+    original_tokens = estimate_tokens("\n".join(f"- {note}" for note in notes))
+    
+    weighted = sorted(collapse_near_duplicates(notes), key=lambda note: -note.weight)
+    kept: List[WeightedNote] = []
+    used = 0
+    for note in weighted:
+        cost = estimate_tokens(format_prompt_note(note))
+        if kept and used + cost > token_budget:
+            continue
+        kept.append(note)
+        used += cost
+    
+    compacted_tokens = estimate_tokens("\n".join(format_prompt_note(note) for note in kept))
+    return kept, max(0, original_tokens - compacted_tokens)
+
+# ==================== EXTRACTIVE SUMMARIZER ====================
+
+SUMMARY_MODE_PATTERN = "^(ai|fast)$"
+EXTRACTIVE_MODEL = "extractive"
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "has", "have", "in", "is",
+    "it", "its", "of", "on", "or", "our", "so", "that", "the", "this", "to", "we", "will", "with",
+}
+
+def _note_terms(text: str) -> List[str]:
+    return [term for term in normalize_note(text).split() if len(term) > 1 and term not in STOPWORDS]
+
+def extractive_summary(notes: List[str], frame_title: str, max_bullets: int = 5) -> SlideContent:
+    """Pick the most representative notes without calling an LLM.
+
+    Near-duplicates are collapsed first (their count boosts the score), then each
+    note is scored by TF-IDF cosine similarity to the frame centroid. The frame
+    title is kept unless it is missing, in which case the top note is used.
+    """
+    weighted = collapse_near_duplicates(notes)
+    if not weighted:
+        return SlideContent(title=frame_title, bullets=[], model=EXTRACTIVE_MODEL)
+    
+    term_lists = [_note_terms(note.text) for note in weighted]
+    document_frequency: Dict[str, int] = {}
+    for terms in term_lists:
+        for term in set(terms):
+            document_frequency[term] = document_frequency.get(term, 0) + 1
+    idf = {term: math.log((1 + len(weighted)) / (1 + df)) + 1 for term, df in document_frequency.items()}
+    
+    vectors = []
+    for terms in term_lists:
+        vector: Dict[str, float] = {}
+        for term in terms:
+            vector[term] = vector.get(term, 0.0) + idf[term]
+        norm = math.sqrt(sum(value * value for value in vector.values())) or 1.0
+        vectors.append({term: value / norm for term, value in vector.items()})
+    
+    centroid: Dict[str, float] = {}
+    for note, vector in zip(weighted, vectors):
+        for term, value in vector.items():
+            centroid[term] = centroid.get(term, 0.0) + value * note.weight
+    
+    def score(i: int) -> float:
+        similarity = sum(value * centroid.get(term, 0.0) for term, value in vectors[i].items())
+        return similarity * (1 + math.log(weighted[i].weight))
+    
+    ranked = sorted(range(len(weighted)), key=score, reverse=True)
+    bullets = [weighted[i].text for i in ranked[:max_bullets]]
+    
+    title = frame_title
+    if not title or title == "Untitled Frame":
+        title = " ".join(bullets[0].split()[:8])
+    
+    return SlideContent(title=title, bullets=bullets, model=EXTRACTIVE_MODEL)
+
+# ==================== MODEL ROUTING ====================
+
+SMALL_SUMMARY_MODEL = os.environ.get('SMALL_SUMMARY_MODEL', 'llama-3.1-8b-instant')
+LARGE_SUMMARY_MODEL = os.environ.get('LARGE_SUMMARY_MODEL', 'llama-3.3-70b-versatile')
+# Prompts with at most this many (deduplicated) notes and tokens go to the small model
+ROUTING_SMALL_MAX_NOTES = int(os.environ.get('ROUTING_SMALL_MAX_NOTES', '12'))
+ROUTING_SMALL_MAX_TOKENS = int(os.environ.get('ROUTING_SMALL_MAX_TOKENS', '300'))
+# JSON object of template id -> model, e.g. {"corporate": "llama-3.3-70b-versatile"}
+MODEL_TEMPLATE_OVERRIDES: Dict[str, str] = json.loads(os.environ.get('MODEL_TEMPLATE_OVERRIDES', '{}'))
+
+def choose_summary_model(note_count: int, prompt_tokens: int, template: Optional[str] = None) -> str:
+    """Send small frames to the fast model and large ones to the big model"""
+    if template and template in MODEL_TEMPLATE_OVERRIDES:
+        return MODEL_TEMPLATE_OVERRIDES[template]
+    if note_count <= ROUTING_SMALL_MAX_NOTES and prompt_tokens <= ROUTING_SMALL_MAX_TOKENS:
+        return SMALL_SUMMARY_MODEL
+    return LARGE_SUMMARY_MODEL
+
+# ==================== LLM CALLS ====================
+
+# Upper bound on concurrent LLM calls across the whole process: every request_llm_json
+# call (slide prompts, batch exports, late deadline tasks) takes a slot. Map-reduce
+# chunks use their own MAP_REDUCE_CONCURRENCY budget.
+LLM_CONCURRENCY = int(os.environ.get('LLM_CONCURRENCY', '4'))
+llm_semaphore = asyncio.Semaphore(LLM_CONCURRENCY)
+
+async def run_bounded(jobs: list, worker, concurrency: int) -> list:
+    """Run ``worker(job)`` for every job in order with at most ``concurrency`` in flight.
+
+    This only orders the jobs; LLM calls are capped globally by ``llm_semaphore``.
+    """
+    results: list = [None] * len(jobs)
+    next_job = iter(enumerate(jobs))
+    
+    async def drain():
+        for index, job in next_job:
+            results[index] = await worker(job)
+    
+    await asyncio.gather(*(drain() for _ in range(max(1, min(concurrency, len(jobs))))))
+    return results
+
+# LRU of successful AI summaries, keyed by frame title and notes
+SUMMARY_CACHE_SIZE = int(os.environ.get('SUMMARY_CACHE_SIZE', '1024'))
+
+class SummaryCache:
+    """Small in-memory LRU of AI slide summaries"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[str, SlideContent]" = OrderedDict()
+
+    @staticmethod
+    def key(request: SummarizeRequest) -> str:
+        payload = json.dumps([request.frame_title, request.notes, request.template], ensure_ascii=False)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[SlideContent]:
+        slide = self.entries.get(key)
+        if slide is not None:
+            self.entries.move_to_end(key)
+        return slide
+
+    def put(self, key: str, slide: SlideContent):
+        self.entries[key] = slide
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+summary_cache = SummaryCache(SUMMARY_CACHE_SIZE)
+
+SLIDE_SYSTEM_PROMPT = "You are a premium presentation designer that creates editorial-style, magazine-quality slide content. Always respond with valid JSON only."
+
+async def request_llm_json(api_key: str, system_prompt: str, prompt: str, max_tokens: int = 500,
+                           model: str = LARGE_SUMMARY_MODEL, semaphore: Optional[asyncio.Semaphore] = None) -> dict:
+    """Send one chat completion to Groq and parse its JSON answer.
+
+    The call waits for a slot in ``semaphore``, the shared ``llm_semaphore`` by default.
+    """
+    client = AsyncGroq(api_key=api_key)
+    
+    async with semaphore or llm_semaphore:
+        response = await groq_breaker.call(
+            client.chat.completions.create,
+            model=model,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.7,
+            max_tokens=max_tokens
+        )
+    
+    response_text = response.choices[0].message.content
+    
+    # Parse the JSON response
+    clean_response = response_text.strip()
+    if clean_response.startswith("```json"):
+        clean_response = clean_response.replace("```json", "").replace("```", "").strip()
+    elif clean_response.startswith("```"):
+        clean_response = clean_response.split("\n", 1)[1]
+        clean_response = clean_response.rsplit("```", 1)[0].strip()
+    
+    return json.loads(clean_response)
+
+# ==================== MAP-REDUCE SUMMARIZATION ====================
+
+# Frames above either threshold are condensed chunk by chunk before the slide prompt
+MAP_REDUCE_NOTE_THRESHOLD = int(os.environ.get('MAP_REDUCE_NOTE_THRESHOLD', '150'))
+MAP_REDUCE_TOKEN_THRESHOLD = int(os.environ.get('MAP_REDUCE_TOKEN_THRESHOLD', str(PROMPT_TOKEN_BUDGET)))
+MAP_REDUCE_CHUNK_SIZE = int(os.environ.get('MAP_REDUCE_CHUNK_SIZE', '40'))
+# Map steps have their own process-wide budget so a huge frame's chunks do not
+# queue behind (or starve) ordinary slide prompts in llm_semaphore
+MAP_REDUCE_CONCURRENCY = int(os.environ.get('MAP_REDUCE_CONCURRENCY', '16'))
+map_reduce_semaphore = asyncio.Semaphore(MAP_REDUCE_CONCURRENCY)
+
+CHUNK_SYSTEM_PROMPT = "You condense workshop brainstorm notes into their key points. Always respond with valid JSON only."
+
+def needs_map_reduce(notes: List[str]) -> bool:
+    return (len(notes) > MAP_REDUCE_NOTE_THRESHOLD or
+            estimate_tokens("\n".join(notes)) > MAP_REDUCE_TOKEN_THRESHOLD)
+
+def _morton_code(x: int, y: int) -> int:
+    code = 0
+    for bit in range(16):
+        code |= ((x >> bit) & 1) << (2 * bit) | ((y >> bit) & 1) << (2 * bit + 1)
+    return code
+
+def order_notes_spatially(notes: List[str], positions: List[Tuple[float, float]]) -> List[str]:
+    """Order notes along a Z-order curve so consecutive chunks are spatial neighbours"""
+    xs = [position[0] for position in positions]
+    ys = [position[1] for position in positions]
+    span_x = (max(xs) - min(xs)) or 1
+    span_y = (max(ys) - min(ys)) or 1
+    
+    def cell(i):
+        return _morton_code(int((xs[i] - min(xs)) / span_x * 1023), int((ys[i] - min(ys)) / span_y * 1023))
+    
+    return [notes[i] for i in sorted(range(len(notes)), key=cell)]
+
+async def summarize_chunk(api_key: str, frame_title: str, chunk: List[str], template: Optional[str] = None) -> List[str]:
+    """Map step: condense one chunk of notes into a few key points"""
+    compacted = compact_notes(chunk)[0]
+    notes_text = "\n".join(format_prompt_note(note) for note in compacted)
+    model = choose_summary_model(len(compacted), estimate_tokens(notes_text), template)
+    prompt = f"""Condense this section of brainstorm notes from "{frame_title}" into its 3-6 most important, distinct points.
+
+Notes (a trailing "(xN)" means N participants wrote the same idea):
+{notes_text}
+
+Return a JSON object with "points": a list of short points (max 15 words each), most important first.
+
+Respond ONLY with valid JSON, no markdown or extra text."""
+    try:
+        result = await request_llm_json(api_key, CHUNK_SYSTEM_PROMPT, prompt, model=model, semaphore=map_reduce_semaphore)
+        points = [str(point) for point in result.get("points", []) if str(point).strip()]
+        if points:
+            return points
+    except Exception as e:
+        logger.error(f"Chunk summarization error for '{frame_title}': {str(e)}")
+    # Keep the most representative notes so every level still shrinks
+    return extractive_summary(chunk, frame_title).bullets
+
+async def map_reduce_notes(api_key: str, frame_title: str, notes: List[str], positions: Optional[List[Tuple[float, float]]] = None,
+                           template: Optional[str] = None) -> List[str]:
+    """Reduce an oversized frame to a prompt-sized list of key points.
+
+    Notes are split into chunks (spatially clustered when positions are known),
+    each level's chunks are summarized in parallel, and the resulting points
+    are reduced again until they fit. The number of levels grows with
+    log(frame size), but a level runs at most MAP_REDUCE_CONCURRENCY chunks at
+    once (shared by all requests), so a level with more chunks than that takes
+    time linear in its size: 4,000 notes make 100 chunks, i.e. 7 rounds at 16.
+    """
+    level = notes
+    if positions and len(positions) == len(notes):
+        level = order_notes_spatially(notes, positions)
+    
+    depth = 0
+    while needs_map_reduce(level):
+        chunks = [level[i:i + MAP_REDUCE_CHUNK_SIZE] for i in range(0, len(level), MAP_REDUCE_CHUNK_SIZE)]
+        partials = await run_bounded(
+            chunks, lambda chunk: summarize_chunk(api_key, frame_title, chunk, template), MAP_REDUCE_CONCURRENCY
+        )
+        reduced = [point for points in partials for point in points]
+        depth += 1
+        logger.info(f"Map-reduce level {depth} for '{frame_title}': {len(level)} notes -> {len(reduced)} points")
+        if len(reduced) >= len(level):
+            break
+        level = reduced
+    
+    return level
+
+@api_router.post("/summarize", response_model=SlideContent, dependencies=[Depends(admission("summarize"))])
+async def summarize_frame_content(request: SummarizeRequest, mode: str = Query("ai", pattern=SUMMARY_MODE_PATTERN)):
+    """Use AI to summarize sticky note content into premium editorial slide format.
+
+    ``mode=fast`` skips the LLM and returns the local extractive summary.
+    """
+    if mode == "fast":
+        return extractive_summary(request.notes, request.frame_title)
+    
     api_key = os.environ.get('GROQ_API_KEY')
     if not api_key:
-        logger.warning("GROQ_API_KEY not configured, returning basic summary")
-        return SlideContent(
-            title=request.frame_title,
-            bullets=request.notes[:5]
-        )
+        logger.warning("GROQ_API_KEY not configured, returning extractive summary")
+        return extractive_summary(request.notes, request.frame_title)
+    
+    cache_key = SummaryCache.key(request)
+    cached = summary_cache.get(cache_key)
+    if cached is not None:
+        return cached
     
-    notes_text = "\n".join([f"- {note}" for note in request.notes])
+    notes = request.notes
+    if needs_map_reduce(notes):
+        notes = await map_reduce_notes(api_key, request.frame_title, notes, request.positions, request.template)
+    
+    compacted, tokens_saved = compact_notes(notes)
+    notes_text = "\n".join([format_prompt_note(note) for note in compacted])
+    model = choose_summary_model(len(compacted), estimate_tokens(notes_text), request.template)
+    logger.info(f"Prompt compaction for '{request.frame_title}': {len(request.notes)} notes -> {len(compacted)}, ~{tokens_saved} tokens saved, routed to {model}")
     
     prompt = f"""You are a Digital Product Designer creating premium, editorial-style presentation content. Transform these brainstorm notes from "{request.frame_title}" into curated slide content.
 
-Notes:
+Notes (a trailing "(xN)" means N participants wrote the same idea):
 {notes_text}
 
 Return a JSON object with:
@@ -553,104 +2152,374 @@ Requirements:
 Respond ONLY with valid JSON, no markdown or extra text."""
 
     try:
-        client = AsyncGroq(api_key=api_key)
-        
-        response = await client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[
-                {"role": "system", "content": "You are a premium presentation designer that creates editorial-style, magazine-quality slide content. Always respond with valid JSON only."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7,
-            max_tokens=500
-        )
-        
-        response_text = response.choices[0].message.content
-        
-        # Parse the JSON response
-        clean_response = response_text.strip()
-        if clean_response.startswith("```json"):
-            clean_response = clean_response.replace("```json", "").replace("```", "").strip()
-        elif clean_response.startswith("```"):
-            clean_response = clean_response.split("\n", 1)[1]
-            clean_response = clean_response.rsplit("```", 1)[0].strip()
+        result = await request_llm_json(api_key, SLIDE_SYSTEM_PROMPT, prompt, model=model)
         
-        result = json.loads(clean_response)
+        bullets = result.get("bullets")
+        if isinstance(bullets, list):
+            bullets = [str(bullet) for bullet in bullets if str(bullet).strip()]
+        if not bullets or not isinstance(bullets, list):
+            bullets = extractive_summary(request.notes, request.frame_title).bullets
         
         # Combine bullets with aspirational insight if present
-        bullets = result.get("bullets", request.notes[:5])
         if result.get("aspirational_insight"):
             bullets.append(f"✦ {result.get('aspirational_insight')}")
         
-        return SlideContent(
+        slide = SlideContent(
             title=result.get("title", request.frame_title),
-            bullets=bullets
+            bullets=bullets,
+            tokens_saved=tokens_saved,
+            model=model
         )
+        summary_cache.put(cache_key, slide)
+        return slide
     except Exception as e:
         logger.error(f"AI summarization error: {str(e)}")
-        return SlideContent(
-            title=request.frame_title,
-            bullets=request.notes[:5]
-        )
+        return extractive_summary(request.notes, request.frame_title)
+
+# Late AI summaries still finishing after their request's deadline (kept referenced until done).
+# Their LLM calls take llm_semaphore slots like any other; past the cap, late work is cancelled.
+LATE_SUMMARY_MAX_TASKS = int(os.environ.get('LATE_SUMMARY_MAX_TASKS', str(LLM_CONCURRENCY * 2)))
+late_summary_tasks: set = set()
+
+async def summarize_frame_slide(frame: Frame, notes: List[StickyNote], mode: str = "ai",
+                                deadline: Optional[float] = None, cache_late: bool = True,
+                                template: Optional[str] = None) -> dict:
+    """Build the slide entry for one frame (including empty frames).
+
+    ``deadline`` is an event loop time. A summary that is not ready by then is
+    replaced by the extractive one and marked ``degraded``; with ``cache_late``
+    the AI call keeps running (up to LATE_SUMMARY_MAX_TASKS at once) so its
+    result lands in the summary cache.
+    """
+    notes_text = [note.text for note in notes] if notes else []
+    
+    # Handle frames with no sticky notes
+    if not notes_text:
+        return {
+            "frame_id": frame.id,
+            "frame_title": frame.title,
+            "slide": {
+                "title": frame.title,
+                "bullets": ["Content to be added"]
+            },
+            "raw_notes": [],
+            "is_empty_frame": True,
+            "degraded": False
+        }
+    
+    def fallback(degraded: bool) -> dict:
+        return {
+            "frame_id": frame.id,
+            "frame_title": frame.title,
+            "slide": extractive_summary(notes_text, frame.title).model_dump(),
+            "raw_notes": notes_text,
+            "is_empty_frame": False,
+            "degraded": degraded
+        }
+    
+    request = SummarizeRequest(
+        notes=notes_text,
+        frame_title=frame.title,
+        positions=[[note.x + note.width / 2, note.y + note.height / 2] for note in notes],
+        template=template
+    )
+    
+    try:
+        if deadline is None:
+            slide_content = await summarize_frame_content(request, mode=mode)
+        else:
+            remaining = deadline - asyncio.get_running_loop().time()
+            if remaining <= 0:
+                return fallback(degraded=True)
+            task = asyncio.create_task(summarize_frame_content(request, mode=mode))
+            await asyncio.wait({task}, timeout=remaining)
+            if not task.done():
+                logger.warning(f"Frame {frame.id} missed its deadline, returning extractive summary")
+                if cache_late and len(late_summary_tasks) < LATE_SUMMARY_MAX_TASKS:
+                    late_summary_tasks.add(task)
+                    task.add_done_callback(late_summary_tasks.discard)
+                else:
+                    task.cancel()
+                return fallback(degraded=True)
+            slide_content = task.result()
+        
+        return {
+            "frame_id": frame.id,
+            "frame_title": frame.title,
+            "slide": slide_content.model_dump(),
+            "raw_notes": notes_text,
+            "is_empty_frame": False,
+            "degraded": False
+        }
+    except Exception as e:
+        logger.error(f"Error summarizing frame {frame.id}: {str(e)}")
+        return fallback(degraded=False)
+
+@api_router.post("/summarize-all", dependencies=[Depends(admission("summarize_all"))])
+async def summarize_all_frames(
+    mode: str = Query("ai", pattern=SUMMARY_MODE_PATTERN),
+    deadline_ms: Optional[int] = Query(None, gt=0),
+    x_deadline_ms: Optional[int] = Header(None, gt=0),
+    cache_late: bool = Query(True),
+    template: Optional[str] = Query(None),
+):
+    """Summarize all frames in the board (including empty frames).
 
-@api_router.post("/summarize-all")
-async def summarize_all_frames():
-    """Summarize all frames in the board (including empty frames)"""
+    A deadline (``deadline_ms`` or the ``X-Deadline-Ms`` header) bounds the whole
+    request: frames still waiting on the LLM get the extractive summary instead.
+    """
     api_key = os.environ.get('GROQ_API_KEY')
-    if not api_key:
-        logger.warning("GROQ_API_KEY not configured, using basic summaries")
+    if not api_key and mode != "fast":
+        logger.warning("GROQ_API_KEY not configured, using extractive summaries")
     
+    budget_ms = deadline_ms or x_deadline_ms
+    deadline = asyncio.get_running_loop().time() + budget_ms / 1000 if budget_ms else None
     frame_notes = map_notes_to_frames(MOCK_MIRO_BOARD.frames, MOCK_MIRO_BOARD.sticky_notes)
     
-    results = []
-    for frame in MOCK_MIRO_BOARD.frames:
-        notes = frame_notes.get(frame.id, [])
-        notes_text = [note.text for note in notes] if notes else []
-        
-        # Handle frames with no sticky notes
-        if not notes_text:
-            results.append({
-                "frame_id": frame.id,
-                "frame_title": frame.title,
-                "slide": {
-                    "title": frame.title,
-                    "bullets": ["Content to be added"]
-                },
-                "raw_notes": [],
-                "is_empty_frame": True
-            })
-            continue
-        
-        try:
-            request = SummarizeRequest(notes=notes_text, frame_title=frame.title)
-            slide_content = await summarize_frame_content(request)
-            
-            results.append({
-                "frame_id": frame.id,
-                "frame_title": frame.title,
-                "slide": slide_content.model_dump(),
-                "raw_notes": notes_text,
-                "is_empty_frame": False
-            })
-        except Exception as e:
-            logger.error(f"Error summarizing frame {frame.id}: {str(e)}")
-            results.append({
-                "frame_id": frame.id,
-                "frame_title": frame.title,
-                "slide": {"title": frame.title, "bullets": notes_text[:5]},
-                "raw_notes": notes_text,
-                "is_empty_frame": False
-            })
+    results = await run_bounded(
+        MOCK_MIRO_BOARD.frames,
+        lambda frame: summarize_frame_slide(
+            frame, frame_notes.get(frame.id, []), mode=mode, deadline=deadline, cache_late=cache_late,
+            template=template
+        ),
+        LLM_CONCURRENCY
+    )
     
     return {
         "board_name": MOCK_MIRO_BOARD.name,
-        "slides": results
+        "slides": results,
+        "degraded_count": sum(1 for result in results if result["degraded"])
     }
 
+# ==================== BATCH EXPORT ====================
+
+class BatchExportRequest(BaseModel):
+    board_ids: List[str] = Field(min_length=1)
+    combine: bool = False
+    mode: str = Field("ai", pattern=SUMMARY_MODE_PATTERN)
+    include_assets: bool = False
+    template: Optional[str] = None
+
+def interleave_round_robin(queues: List[list]) -> list:
+    """Take one job from each queue in turn so a long queue cannot starve short ones"""
+    interleaved = []
+    for depth in range(max((len(queue) for queue in queues), default=0)):
+        for queue in queues:
+            if depth < len(queue):
+                interleaved.append(queue[depth])
+    return interleaved
+
+@miro_router.post("/boards/batch", dependencies=[Depends(admission("batch_export"))])
+async def batch_export_boards(request: BatchExportRequest):
+    """Load several Miro boards concurrently and summarize all their frames through one LLM pool"""
+    if "default" not in token_store:
+        raise HTTPException(status_code=401, detail="Not connected to Miro")
+    
+    board_ids = list(dict.fromkeys(request.board_ids))
+    # Let prefetches of these boards finish into snapshots instead of loading them twice
+    prefetching = [prefetch_tasks[board_id] for board_id in board_ids if board_id in prefetch_tasks]
+    if prefetching:
+        await asyncio.wait(prefetching)
+    loaded = await asyncio.gather(*(load_miro_board(board_id) for board_id in board_ids), return_exceptions=True)
+    
+    boards: List[MiroBoard] = []
+    errors = []
+    for board_id, result in zip(board_ids, loaded):
+        if isinstance(result, HTTPException):
+            logger.error(f"Batch export failed to load board {board_id}: {result.detail}")
+            errors.append({"board_id": board_id, "status_code": result.status_code, "error": result.detail})
+        elif isinstance(result, CircuitOpenError):
+            errors.append({"board_id": board_id, "status_code": 503, "error": str(result)})
+        elif isinstance(result, Exception):
+            logger.error(f"Batch export failed to load board {board_id}: {str(result)}")
+            errors.append({"board_id": board_id, "status_code": 502, "error": str(result)})
+        else:
+            boards.append(result)
+    
+    # One job queue per board, interleaved so every board's first frames are served early
+    queues = []
+    for board in boards:
+        snapshot = board_snapshots.get(board.id)
+        if snapshot is not None:
+            frame_notes = snapshot.frame_notes()
+        else:
+            frame_notes = await map_notes_to_frames_offloaded(board.frames, board.sticky_notes)
+        queues.append([(board, frame, frame_notes.get(frame.id, [])) for frame in board.frames])
+    jobs = interleave_round_robin(queues)
+    
+    async def summarize_job(job):
+        board, frame, notes = job
+        return board.id, await summarize_frame_slide(frame, notes, mode=request.mode, template=request.template)
+    
+    logger.info(f"Batch export: {len(jobs)} frames across {len(boards)} boards, LLM concurrency {LLM_CONCURRENCY}")
+    summarized = await run_bounded(jobs, summarize_job, LLM_CONCURRENCY)
+    
+    slides_by_board: Dict[str, list] = {board.id: [] for board in boards}
+    for board_id, slide in summarized:
+        slides_by_board[board_id].append(slide)
+    
+    if request.include_assets:
+        downloaded = await asyncio.gather(*(download_board_assets(board.id, board.assets) for board in boards))
+        for board, assets in zip(boards, downloaded):
+            by_frame = group_assets_by_frame(board.frames, assets)
+            for slide in slides_by_board[board.id]:
+                slide["assets"] = by_frame.get(slide["frame_id"], [])
+    
+    if request.combine:
+        return {
+            "board_name": ", ".join(board.name for board in boards),
+            "slides": [
+                {**slide, "board_id": board.id, "board_name": board.name}
+                for board in boards
+                for slide in slides_by_board[board.id]
+            ],
+            "errors": errors
+        }
+    
+    return {
+        "boards": [
+            {"board_id": board.id, "board_name": board.name, "slides": slides_by_board[board.id]}
+            for board in boards
+        ],
+        "errors": errors
+    }
+
+# ==================== REQUEST PROFILING ====================
+
+# Profiling is off unless a token is configured; requests opt in with the X-Profile-Token header
+PROFILING_TOKEN = os.environ.get('PROFILING_TOKEN')
+PROFILING_INTERVAL_MS = float(os.environ.get('PROFILING_INTERVAL_MS', '5'))
+PROFILE_DIR = Path(os.environ.get('PROFILE_DIR', str(ROOT_DIR / 'profiles')))
+# Only the newest profiles are kept
+PROFILE_MAX_FILES = int(os.environ.get('PROFILE_MAX_FILES', '200'))
+
+class StackSampler(threading.Thread):
+    """Samples one thread's Python stack at a fixed interval into folded-stack counts.
+
+    The output ("outer;inner;leaf count" per line) loads directly into
+    flamegraph.pl or speedscope. Only the sampled thread is seen: work shipped
+    to the parse process pool shows up as time waiting on it.
+    """
+
+    def __init__(self, thread_id: int, interval: float):
+        super().__init__(name="request-profiler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Dict[str, int] = {}
+        self.samples = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})")
+                frame = frame.f_back
+            key = ";".join(reversed(names))
+            self.stacks[key] = self.stacks.get(key, 0) + 1
+            self.samples += 1
+
+    def stop(self) -> str:
+        self._stop_event.set()
+        self.join()
+        return "\n".join(f"{stack} {count}" for stack, count in sorted(self.stacks.items())) + "\n"
+
+def profiling_requested(request: Request) -> bool:
+    if not PROFILING_TOKEN:
+        return False
+    token = request.headers.get("X-Profile-Token")
+    return bool(token) and hmac.compare_digest(token, PROFILING_TOKEN)
+
+def save_profile(folded: str) -> str:
+    """Write a folded profile and prune the oldest beyond PROFILE_MAX_FILES"""
+    profile_id = f"{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    (PROFILE_DIR / f"{profile_id}.folded").write_text(folded)
+    # Ids start with a UTC timestamp, so name order is age order
+    for stale in sorted(PROFILE_DIR.glob("*.folded"))[:-max(1, PROFILE_MAX_FILES)]:
+        stale.unlink(missing_ok=True)
+    return profile_id
+
+class ProfilingMiddleware:
+    """Capture a sampled profile of the event loop while an opted-in request runs.
+
+    Plain ASGI rather than ``@app.middleware``: with profiling off every request
+    goes straight through. The response start is held back until the last body
+    chunk so the profile id and sample count can be added as headers (streamed
+    responses go out without them; their profile is still saved).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if not PROFILING_TOKEN or scope["type"] != "http" or not profiling_requested(Request(scope)):
+            await self.app(scope, receive, send)
+            return
+        
+        sampler = StackSampler(threading.get_ident(), PROFILING_INTERVAL_MS / 1000)
+        sampler.start()
+        started = time.perf_counter()
+        pending_start = []
+        profile_ids = []
+        
+        def finish():
+            if profile_ids:
+                return
+            profile_ids.append(save_profile(sampler.stop()))
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            logger.info(f"Profiled {scope['method']} {scope['path']}: {elapsed_ms:.0f}ms, {sampler.samples} samples -> {profile_ids[0]}")
+        
+        async def send_with_profile(message):
+            if message["type"] == "http.response.start":
+                pending_start.append(message)
+                return
+            if pending_start:
+                start_message = pending_start.pop()
+                headers = MutableHeaders(scope=start_message)
+                if not message.get("more_body", False):
+                    finish()
+                    headers["X-Profile-Id"] = profile_ids[0]
+                    headers["X-Profile-Samples"] = str(sampler.samples)
+                await send(start_message)
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_with_profile)
+        finally:
+            finish()
+
+@api_router.get("/profiles/{profile_id}")
+async def get_profile(profile_id: str, request: Request):
+    """Download a stored profile in folded-stack format"""
+    if not profiling_requested(request):
+        raise HTTPException(status_code=404, detail="Not found")
+    if not re.fullmatch(r"[0-9A-Za-z-]+", profile_id):
+        raise HTTPException(status_code=400, detail="Invalid profile id")
+    path = PROFILE_DIR / f"{profile_id}.folded"
+    if not path.exists():
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="text/plain")
+
 # Include routers
 app.include_router(api_router)
 app.include_router(miro_router)
 
+@app.exception_handler(CircuitOpenError)
+async def circuit_open_handler(request: Request, exc: CircuitOpenError):
+    """Fail fast with 503 while an upstream's breaker is open"""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(max(1, math.ceil(exc.retry_after)))}
+    )
+
+app.add_middleware(ProfilingMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
@@ -672,6 +2541,7 @@ async def startup_event():
 @app.on_event("shutdown")
 async def shutdown_db_client():
     logger.info("APPLICATION SHUTTING DOWN")
+    shutdown_parse_executor()
     if client:
         client.close()
 
@@ -0,0 +1,89 @@
+"""Event-loop latency benchmark for board parsing.
+
+Runs several concurrent large-board parses while a ticker coroutine measures how
+late the event loop wakes it up, once per BOARD_PARSE_EXECUTOR setting.
+
+    python backend_bench.py [items_per_board] [concurrent_boards]
+"""
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / "backend"))
+
+import server  # noqa: E402
+
+TICK_SECONDS = 0.005
+
+
+def make_board_items(item_count, frame_count=50):
+    """Synthetic Miro items: a grid of frames with HTML sticky notes parented to them"""
+    items = [
+        {
+            "id": f"frame-{f}",
+            "type": "frame",
+            "position": {"x": (f % 10) * 1000, "y": (f // 10) * 1000},
+            "geometry": {"width": 900, "height": 900},
+            "data": {"title": f"Frame {f}"},
+        }
+        for f in range(frame_count)
+    ]
+    for i in range(item_count - frame_count):
+        items.append({
+            "id": f"note-{i}",
+            "type": "sticky_note",
+            "parent": {"id": f"frame-{i % frame_count}"},
+            "position": {"x": (i * 37) % 800, "y": (i * 53) % 800},
+            "geometry": {"width": 150, "height": 100},
+            "style": {"fillColor": "light_yellow"},
+            "data": {"content": f"<p>Idea <strong>number {i}</strong> from the workshop</p>"},
+        })
+    return items
+
+
+async def measure(items, boards):
+    lags = []
+    done = asyncio.Event()
+
+    async def ticker():
+        while not done.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(TICK_SECONDS)
+            lags.append(time.perf_counter() - start - TICK_SECONDS)
+
+    async def load_board():
+        frames, notes = await server.parse_board_items_offloaded(items)
+        await server.map_notes_to_frames_offloaded(frames, notes)
+
+    tick_task = asyncio.create_task(ticker())
+    await asyncio.sleep(TICK_SECONDS * 2)
+    start = time.perf_counter()
+    await asyncio.gather(*(load_board() for _ in range(boards)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    await tick_task
+    return elapsed, lags
+
+
+def main():
+    item_count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    boards = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    items = make_board_items(item_count)
+    server.logger.setLevel("WARNING")
+
+    print(f"{boards} concurrent boards x {item_count} items, {server.BOARD_PARSE_WORKERS} workers")
+    print(f"{'executor':<10}{'wall (s)':>10}{'loop lag p50 (ms)':>20}{'p99 (ms)':>12}{'max (ms)':>12}")
+    for executor in ("inline", "thread", "process"):
+        server.BOARD_PARSE_EXECUTOR = executor
+        server.shutdown_parse_executor()
+        elapsed, lags = asyncio.run(measure(items, boards))
+        lags_ms = sorted(lag * 1000 for lag in lags) or [0.0]
+        p99 = lags_ms[min(len(lags_ms) - 1, int(len(lags_ms) * 0.99))]
+        print(f"{executor:<10}{elapsed:>10.2f}{statistics.median(lags_ms):>20.1f}{p99:>12.1f}{lags_ms[-1]:>12.1f}")
+    server.shutdown_parse_executor()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,853 @@
+import sys
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import server  # noqa: E402
+
+client = TestClient(server.app)
+
+
+async def fake_public_dns(host):
+    return ["93.184.216.34"]
+
+
+def test_columnar_board_round_trip():
+    """Columnar payload decodes back to the same board as the object form"""
+    object_form = client.get("/api/board").json()
+    columnar = client.get("/api/board", params={"format": "columnar"}).json()
+
+    assert columnar["format"] == "columnar"
+    assert server.board_from_columnar(columnar).model_dump() == object_form
+
+
+def test_columnar_frame_membership_matches_mapping():
+    columnar = server.board_to_columnar(server.MOCK_MIRO_BOARD)
+    frame_notes = server.map_notes_to_frames(server.MOCK_MIRO_BOARD.frames, server.MOCK_MIRO_BOARD.sticky_notes)
+
+    for frame_id, indices in zip(columnar["frames"]["id"], columnar["frames"]["notes"]):
+        ids = [columnar["sticky_notes"]["id"][i] for i in indices]
+        assert ids == [note.id for note in frame_notes[frame_id]]
+
+
+def test_unknown_board_format_rejected():
+    assert client.get("/api/board", params={"format": "xml"}).status_code == 422
+
+
+def test_board_field_projection_and_frame_filter():
+    response = client.get("/api/board", params={"fields": "text", "frame_ids": "frame-2"}).json()
+
+    assert response["frames"] == [{"id": "frame-2"}]
+    assert [note["text"] for note in response["sticky_notes"]] == [
+        "Limited engineering resources",
+        "Competitor pricing pressure",
+        "Legacy system migration",
+        "Supply chain uncertainties",
+    ]
+    assert set(response["sticky_notes"][0]) == {"id", "text"}
+
+
+def test_board_type_filter_returns_frame_outlines():
+    response = client.get("/api/board", params={"types": "frame"}).json()
+
+    assert len(response["frames"]) == 4
+    assert response["sticky_notes"] == []
+    assert client.get("/api/board", params={"types": "connector"}).status_code == 400
+
+
+def test_parse_board_items_resolves_children_and_filters_types():
+    items = [
+        {"id": "f1", "type": "frame", "position": {"x": 100, "y": 100}, "geometry": {"width": 400, "height": 300}, "data": {"title": "Ideas"}},
+        {"id": "s1", "type": "sticky_note", "parent": {"id": "f1"}, "position": {"x": 10, "y": 20}, "data": {"content": "<p>Ship it</p>"}, "style": {"fillColor": "light_blue"}},
+        {"id": "t1", "type": "text", "position": {"x": 0, "y": 0}, "data": {"content": "Loose text"}},
+    ]
+
+    frames, notes = server.parse_board_items(items, types=["sticky_note"])
+
+    assert frames == []
+    assert [(n.id, n.text, n.x, n.y, n.color) for n in notes] == [("s1", "Ship it", 110, 120, "blue")]
+
+
+def test_interleave_round_robin_is_fair():
+    assert server.interleave_round_robin([[1, 2, 3, 4], ["a"], ["x", "y"]]) == [1, "a", "x", 2, "y", 3, 4]
+
+
+def test_batch_export_per_board_and_combined(monkeypatch):
+    async def fake_board(board_id, **kwargs):
+        if board_id == "missing":
+            raise server.HTTPException(status_code=404, detail="Not found")
+        return server.MOCK_MIRO_BOARD.model_copy(update={"id": board_id})
+
+    monkeypatch.delenv("GROQ_API_KEY", raising=False)
+    monkeypatch.setitem(server.token_store, "default", {"access_token": "token"})
+    monkeypatch.setattr(server, "load_miro_board", fake_board)
+
+    per_board = client.post("/api/miro/boards/batch", json={"board_ids": ["b1", "b2", "missing"]}).json()
+    assert [b["board_id"] for b in per_board["boards"]] == ["b1", "b2"]
+    assert all(len(b["slides"]) == 4 for b in per_board["boards"])
+    assert per_board["errors"] == [{"board_id": "missing", "status_code": 404, "error": "Not found"}]
+
+    combined = client.post("/api/miro/boards/batch", json={"board_ids": ["b1", "b2"], "combine": True}).json()
+    assert [s["board_id"] for s in combined["slides"]] == ["b1"] * 4 + ["b2"] * 4
+
+
+def test_compact_notes_collapses_near_duplicates_and_weights_them():
+    notes = ["More coffee!", "Ship the mobile app", "more coffee", "More  coffee.", "ship the mobile app"]
+
+    kept, tokens_saved = server.compact_notes(notes)
+
+    assert [(n.text, n.weight) for n in kept] == [("More coffee!", 3), ("Ship the mobile app", 2)]
+    assert tokens_saved > 0
+
+
+def test_compact_notes_trims_to_budget_by_weight():
+    notes = ["rare idea about onboarding"] + ["popular idea about pricing"] * 3
+
+    kept, _ = server.compact_notes(notes, token_budget=8)
+
+    assert [n.text for n in kept] == ["popular idea about pricing"]
+
+
+def test_map_reduce_summarizes_oversized_frame_in_levels(monkeypatch):
+    calls = []
+
+    async def fake_llm(api_key, system_prompt, prompt, max_tokens=500, model=None, semaphore=None):
+        calls.append(system_prompt)
+        if system_prompt == server.CHUNK_SYSTEM_PROMPT:
+            return {"points": [f"point {len(calls)}a", f"point {len(calls)}b"]}
+        return {"title": "Reduced", "bullets": ["one", "two", "three"]}
+
+    monkeypatch.setenv("GROQ_API_KEY", "test-key")
+    monkeypatch.setattr(server, "request_llm_json", fake_llm)
+    monkeypatch.setattr(server, "MAP_REDUCE_NOTE_THRESHOLD", 10)
+    monkeypatch.setattr(server, "MAP_REDUCE_CHUNK_SIZE", 8)
+
+    notes = [f"distinct idea number {i} {'x' * i}" for i in range(64)]
+    positions = [[i % 8 * 100, i // 8 * 100] for i in range(64)]
+    response = client.post("/api/summarize", json={"notes": notes, "frame_title": "Huge", "positions": positions})
+
+    assert response.json()["title"] == "Reduced"
+    # 64 notes -> 8 chunks -> 16 points -> 2 chunks -> 4 points -> final slide prompt
+    assert calls.count(server.CHUNK_SYSTEM_PROMPT) == 10
+    assert calls[-1] == server.SLIDE_SYSTEM_PROMPT
+
+
+def test_fast_mode_returns_extractive_summary_without_llm(monkeypatch):
+    async def fail_llm(*args, **kwargs):
+        raise AssertionError("fast mode must not call the LLM")
+
+    monkeypatch.setenv("GROQ_API_KEY", "test-key")
+    monkeypatch.setattr(server, "request_llm_json", fail_llm)
+    notes = [
+        "Improve onboarding for new customers",
+        "Onboarding emails for new customers",
+        "Team offsite in June",
+        "Simplify customer onboarding checklist",
+        "improve onboarding for new customers!",
+    ]
+
+    slide = client.post("/api/summarize", params={"mode": "fast"}, json={"notes": notes, "frame_title": "Goals"}).json()
+
+    assert slide["title"] == "Goals"
+    assert slide["bullets"][0] == "Improve onboarding for new customers"
+    assert slide["bullets"][-1] == "Team offsite in June"
+    assert len(slide["bullets"]) == 4
+
+
+def test_offloaded_parse_and_mapping_match_inline(monkeypatch):
+    import asyncio
+
+    items = [
+        {"id": "f1", "type": "frame", "position": {"x": 0, "y": 0}, "geometry": {"width": 500, "height": 500}},
+        {"id": "f2", "type": "frame", "position": {"x": 1000, "y": 0}, "geometry": {"width": 500, "height": 500}},
+    ] + [
+        {"id": f"n{i}", "type": "sticky_note", "parent": {"id": f"f{i % 2 + 1}"}, "position": {"x": 10 * i, "y": 20}, "data": {"content": f"<b>note {i}</b>"}}
+        for i in range(7)
+    ]
+    monkeypatch.setattr(server, "BOARD_PARSE_EXECUTOR", "thread")
+    monkeypatch.setattr(server, "BOARD_PARSE_OFFLOAD_THRESHOLD", 1)
+    monkeypatch.setattr(server, "BOARD_PARSE_CHUNK_SIZE", 3)
+    monkeypatch.setattr(server, "_parse_executor", None)
+
+    async def offloaded():
+        frames, notes = await server.parse_board_items_offloaded(items)
+        return frames, notes, await server.map_notes_to_frames_offloaded(frames, notes)
+
+    try:
+        frames, notes, mapped = asyncio.run(offloaded())
+    finally:
+        server.shutdown_parse_executor()
+
+    expected_frames, expected_notes = server.parse_board_items(items)
+    assert frames == expected_frames and notes == expected_notes
+    assert mapped == server.map_notes_to_frames(expected_frames, expected_notes)
+
+
+def test_webhook_events_keep_snapshot_equal_to_full_reload(monkeypatch):
+    from tests.webhook_replay import item_event, replay_events
+
+    def frame(frame_id, x, y):
+        return {"id": frame_id, "type": "frame", "position": {"x": x, "y": y}, "geometry": {"width": 400, "height": 400}, "data": {"title": frame_id}}
+
+    def sticky(note_id, text, x, y, parent=None):
+        item = {"id": note_id, "type": "sticky_note", "position": {"x": x, "y": y}, "geometry": {"width": 100, "height": 100}, "data": {"content": text}}
+        if parent:
+            item["parent"] = {"id": parent}
+        return item
+
+    items = [frame("f1", 0, 0), frame("f2", 1000, 0), sticky("a", "alpha", 50, 50, "f1"), sticky("b", "beta", 1100, 100), sticky("c", "gamma", 2000, 2000)]
+    frames, notes = server.parse_board_items(items)
+    snapshot = server.BoardSnapshot("b1", "Workshop", items, frames, notes, server.map_notes_to_frames(frames, notes))
+    monkeypatch.setitem(server.board_snapshots, "b1", snapshot)
+    monkeypatch.setattr(server, "MIRO_WEBHOOK_SECRET", "hook-secret")
+
+    responses = replay_events([
+        item_event("b1", "create", sticky("d", "delta", 10, 10, "f2")),
+        item_event("b1", "update", {"id": "a", "data": {"content": "alpha v2"}}),
+        item_event("b1", "update", frame("f1", 1900, 1900)),
+        item_event("b1", "delete", {"id": "b", "type": "sticky_note"}),
+        item_event("b1", "delete", {"id": "f2", "type": "frame"}),
+    ], client.post, secret="hook-secret")
+
+    assert responses[0]["affected_frames"] == ["f2"]
+    assert responses[2]["affected_frames"] == ["f1"]
+    expected_frames, expected_notes = server.parse_board_items(list(snapshot.items.values()))
+    assert snapshot.to_board().frames == expected_frames
+    assert snapshot.to_board().sticky_notes == expected_notes
+    expected_mapping = server.map_notes_to_frames(expected_frames, expected_notes)
+    assert {f: {n.id for n in ns} for f, ns in snapshot.frame_notes().items()} == {f: {n.id for n in ns} for f, ns in expected_mapping.items()}
+    assert {n.id for n in snapshot.frame_notes()["f1"]} == {"a", "c"}
+
+    monkeypatch.setitem(server.token_store, "default", {"access_token": "token"})
+    served = client.get("/api/miro/boards/b1").json()
+    assert [note["text"] for note in served["sticky_notes"]] == ["alpha v2", "gamma", "delta"]
+
+
+def test_webhook_challenge_and_unknown_board(monkeypatch):
+    event = {"event": {"boardId": "nope", "type": "update", "item": {"id": "x"}}}
+    assert client.post("/api/miro/webhook", json=event).status_code == 403
+
+    monkeypatch.setattr(server, "MIRO_WEBHOOK_SECRET", "hook-secret")
+    assert client.post("/api/miro/webhook", json=event, params={"secret": "guess"}).status_code == 403
+    assert client.post("/api/miro/webhook", json={"challenge": "abc"}, params={"secret": "hook-secret"}).json() == {"challenge": "abc"}
+    response = client.post("/api/miro/webhook", json=event, params={"secret": "hook-secret"})
+    assert response.json()["status"] == "ignored"
+
+    for malformed in [[event], {"event": "update"}, {"event": {"boardId": "nope", "type": "update", "item": "x"}}]:
+        assert client.post("/api/miro/webhook", json=malformed, params={"secret": "hook-secret"}).status_code == 400
+
+
+def test_board_snapshot_expires_after_ttl(monkeypatch):
+    import httpx
+
+    board_fetches = []
+
+    def handler(request):
+        if request.url.path == "/v2/boards/b1":
+            board_fetches.append(request.url.path)
+            return httpx.Response(200, json={"id": "b1", "name": f"Workshop v{len(board_fetches)}"})
+        return httpx.Response(200, json={"data": []})
+
+    monkeypatch.setitem(server.token_store, "default", {"access_token": "token"})
+    monkeypatch.setattr(server, "miro_http_client", lambda: httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    monkeypatch.setattr(server, "board_snapshots", {})
+    monkeypatch.setattr(server, "BOARD_SNAPSHOT_TTL_SECONDS", 60)
+
+    assert client.get("/api/miro/boards/b1").json()["name"] == "Workshop v1"
+    assert client.get("/api/miro/boards/b1").json()["name"] == "Workshop v1"
+    assert len(board_fetches) == 1
+
+    server.board_snapshots["b1"].loaded_at -= 61
+    assert client.get("/api/miro/boards/b1").json()["name"] == "Workshop v2"
+    assert len(board_fetches) == 2
+
+
+def test_asset_download_is_cached_by_content_and_evicted_by_size(tmp_path, monkeypatch):
+    import asyncio
+    import httpx
+
+    requests_seen = []
+
+    def handler(request):
+        requests_seen.append(str(request.url))
+        return httpx.Response(200, content=request.url.path.encode() * 100, headers={"content-type": "image/png"})
+
+    monkeypatch.setattr(server, "resolve_host", fake_public_dns)
+    cache = server.AssetCache(tmp_path, max_bytes=2500)
+    monkeypatch.setattr(server, "asset_cache", cache)
+    assets = [
+        server.BoardAsset(id=f"img{i}", type="image", x=0, y=0, width=10, height=10, source_url=f"https://files.test/{i}", version="v1")
+        for i in range(3)
+    ]
+
+    async def download(batch):
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as http_client:
+            return [await server.download_asset(http_client, "token", "b1", asset) for asset in batch]
+
+    first = asyncio.run(download(assets[:1]))
+    again = asyncio.run(download(assets[:1]))
+    assert len(requests_seen) == 1
+    assert again[0].content_hash == first[0].content_hash
+    assert cache.path_for(first[0].content_hash).read_bytes() == b"/0" * 100
+
+    asyncio.run(download(assets[1:]))
+    # Each file is 200 bytes and the cache holds 2500, so nothing is evicted yet
+    assert len(cache.files) == 3
+    cache.max_bytes = 450
+    cache.evict()
+    assert first[0].content_hash not in cache.files
+    assert len(cache.files) == 2
+
+
+def test_prefetch_warms_recent_boards_and_yields_to_user_pick(monkeypatch):
+    import asyncio
+
+    loaded = []
+
+    async def fake_load(board_id, *args, **kwargs):
+        await asyncio.sleep(0.05)
+        loaded.append(board_id)
+        server.board_snapshots[board_id] = object()
+
+    monkeypatch.setattr(server, "load_miro_board", fake_load)
+    monkeypatch.setattr(server, "BOARD_PREFETCH_DELAY_SECONDS", 0)
+    monkeypatch.setattr(server, "_prefetch_semaphore", None)
+    monkeypatch.setattr(server, "board_snapshots", {})
+    boards = [
+        {"id": "old", "modifiedAt": "2026-01-01T00:00:00Z"},
+        {"id": "newest", "modifiedAt": "2026-03-01T00:00:00Z"},
+        {"id": "newer", "modifiedAt": "2026-02-01T00:00:00Z"},
+    ]
+
+    async def scenario():
+        server.schedule_board_prefetch(boards, 2)
+        assert set(server.prefetch_tasks) == {"newest", "newer"}
+        other = server.prefetch_tasks["newer"]
+        await asyncio.sleep(0.01)
+        await server.claim_prefetched_board("newest")
+        await asyncio.sleep(0)
+        return other
+
+    other = asyncio.run(scenario())
+    assert loaded == ["newest"]
+    assert other.cancelled()
+    assert server.prefetch_tasks == {}
+
+
+def test_summarize_all_deadline_degrades_slow_frames_and_caches_late_results(monkeypatch):
+    import time
+
+    async def slow_for_challenges(api_key, system_prompt, prompt, max_tokens=500, model=None):
+        import asyncio
+
+        if "Key Challenges" in prompt:
+            await asyncio.sleep(0.3)
+        return {"title": "AI title", "bullets": ["ai bullet"]}
+
+    monkeypatch.setenv("GROQ_API_KEY", "test-key")
+    monkeypatch.setattr(server, "request_llm_json", slow_for_challenges)
+    monkeypatch.setattr(server, "summary_cache", server.SummaryCache(16))
+
+    with TestClient(server.app) as live_client:
+        started = time.monotonic()
+        first = live_client.post("/api/summarize-all", headers={"X-Deadline-Ms": "100"}).json()
+        assert time.monotonic() - started < 0.3
+        degraded = {slide["frame_title"] for slide in first["slides"] if slide["degraded"]}
+        assert degraded == {"Key Challenges"}
+        assert first["degraded_count"] == 1
+
+        time.sleep(0.4)
+        second = live_client.post("/api/summarize-all", params={"deadline_ms": 100}).json()
+        assert second["degraded_count"] == 0
+        assert all(slide["slide"]["title"] == "AI title" for slide in second["slides"])
+
+
+def test_circuit_breaker_opens_fails_fast_and_recovers_after_probe():
+    import asyncio
+    import httpx
+
+    now = [0.0]
+    breaker = server.CircuitBreaker("miro", slow_call_seconds=5, min_calls=4, error_rate=0.5, open_seconds=30, clock=lambda: now[0])
+    statuses = iter([200, 500, 503, 500, 200])
+    upstream_calls = []
+
+    def handler(request):
+        upstream_calls.append(request.url.path)
+        return httpx.Response(next(statuses))
+
+    async def get():
+        transport = server.CircuitBreakerTransport(breaker, httpx.MockTransport(handler))
+        async with httpx.AsyncClient(transport=transport) as http_client:
+            return (await http_client.get("https://api.miro.test/v2/boards")).status_code
+
+    assert [asyncio.run(get()) for _ in range(4)] == [200, 500, 503, 500]
+    assert breaker.status()["state"] == "open"
+
+    try:
+        asyncio.run(get())
+        raise AssertionError("expected fast failure")
+    except server.CircuitOpenError as e:
+        assert e.retry_after == 30
+    assert len(upstream_calls) == 4
+
+    now[0] = 31
+    assert breaker.status()["state"] == "half_open"
+    assert asyncio.run(get()) == 200
+    assert breaker.status()["state"] == "closed"
+
+
+def test_open_breaker_returns_503_and_is_reported(monkeypatch):
+    breaker = server.CircuitBreaker("miro", slow_call_seconds=5)
+    breaker._open(breaker.clock())
+    monkeypatch.setattr(server, "miro_breaker", breaker)
+    monkeypatch.setitem(server.token_store, "default", {"access_token": "token"})
+
+    response = client.get("/api/miro/boards")
+
+    assert response.status_code == 503
+    assert int(response.headers["Retry-After"]) > 0
+    assert client.get("/api/status").json()["breakers"]["miro"]["state"] == "open"
+
+
+def test_model_routing_by_frame_size_and_template_override(monkeypatch):
+    models = []
+
+    async def fake_llm(api_key, system_prompt, prompt, max_tokens=500, model=None):
+        models.append(model)
+        return {"title": "Routed", "bullets": ["b"]}
+
+    monkeypatch.setenv("GROQ_API_KEY", "test-key")
+    monkeypatch.setattr(server, "request_llm_json", fake_llm)
+    monkeypatch.setattr(server, "summary_cache", server.SummaryCache(16))
+    monkeypatch.setattr(server, "MODEL_TEMPLATE_OVERRIDES", {"corporate": "override-model"})
+    small = ["Ship it", "Hire designers"]
+    large = [f"distinct workshop idea number {i} about topic {i * 7}" for i in range(40)]
+
+    slides = [
+        client.post("/api/summarize", json={"notes": small, "frame_title": "Small"}).json(),
+        client.post("/api/summarize", json={"notes": large, "frame_title": "Large"}).json(),
+        client.post("/api/summarize", json={"notes": small, "frame_title": "Small", "template": "corporate"}).json(),
+    ]
+
+    assert models == [server.SMALL_SUMMARY_MODEL, server.LARGE_SUMMARY_MODEL, "override-model"]
+    assert [slide["model"] for slide in slides] == models
+    assert client.post("/api/summarize", params={"mode": "fast"}, json={"notes": small, "frame_title": "Small"}).json()["model"] == "extractive"
+
+
+def test_profiling_is_opt_in_and_stores_folded_stacks(tmp_path, monkeypatch):
+    monkeypatch.setattr(server, "PROFILING_TOKEN", "secret")
+    monkeypatch.setattr(server, "PROFILING_INTERVAL_MS", 1)
+    monkeypatch.setattr(server, "PROFILE_DIR", tmp_path)
+    notes = [f"workshop idea {i} about topic {i % 13} and theme {i % 7}" for i in range(400)]
+
+    plain = client.post("/api/summarize", params={"mode": "fast"}, json={"notes": notes[:5], "frame_title": "T"})
+    assert "X-Profile-Id" not in plain.headers
+    wrong = client.get("/api/board", headers={"X-Profile-Token": "guess"})
+    assert "X-Profile-Id" not in wrong.headers
+
+    in_query = client.get("/api/board", params={"profile": "secret"})
+    assert "X-Profile-Id" not in in_query.headers
+
+    profiled = client.post("/api/summarize", params={"mode": "fast"}, headers={"X-Profile-Token": "secret"}, json={"notes": notes, "frame_title": "T"})
+    profile_id = profiled.headers["X-Profile-Id"]
+    assert int(profiled.headers["X-Profile-Samples"]) > 0
+
+    assert client.get(f"/api/profiles/{profile_id}").status_code == 404
+    folded = client.get(f"/api/profiles/{profile_id}", headers={"X-Profile-Token": "secret"}).text
+    assert "extractive_summary (server.py:" in folded
+    stack, count = folded.splitlines()[0].rsplit(" ", 1)
+    assert int(count) > 0 and ";" in stack
+
+
+def test_admission_controller_orders_by_priority_and_sheds_low_priority_first():
+    import asyncio
+
+    async def scenario():
+        controller = server.AdmissionController("test", max_concurrent=1, max_queue=2)
+        order = []
+        await controller.acquire(0)
+
+        async def request(name, priority):
+            await controller.acquire(priority)
+            order.append(name)
+            controller.release(0.1)
+
+        batch = asyncio.create_task(request("batch", 1))
+        await asyncio.sleep(0)
+        interactive = asyncio.create_task(request("interactive", 0))
+        await asyncio.sleep(0)
+
+        # Batch requests may only use 75% of the queue, which is already full for them
+        try:
+            await controller.acquire(1)
+            raise AssertionError("expected the batch request to be shed")
+        except server.AdmissionRejected as e:
+            assert e.retry_after >= 1
+        assert controller.status()["queued_by_priority"] == {"interactive": 1, "batch": 1, "background": 0}
+
+        controller.release(0.1)
+        await asyncio.gather(batch, interactive)
+        return order, controller.status()
+
+    order, status = asyncio.run(scenario())
+    assert order == ["interactive", "batch"]
+    assert (status["running"], status["queued"], status["admitted"], status["rejected"]) == (0, 0, 3, 1)
+
+
+def test_full_endpoint_queue_returns_503_with_retry_after(monkeypatch):
+    monkeypatch.setitem(server.admission_controllers, "summarize", server.AdmissionController("summarize", 0, 0))
+
+    response = client.post("/api/summarize", params={"mode": "fast"}, json={"notes": ["a"], "frame_title": "T"})
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    assert client.get("/api/status").json()["admission"]["summarize"]["rejected"] == 1
+    assert client.get("/api/miro/status").status_code == 200
+
+
+def test_filtered_miro_loads_push_types_upstream_and_map_frames_by_position(monkeypatch):
+    import httpx
+
+    requested = []
+    frames = [
+        {"id": "f1", "type": "frame", "position": {"x": 0, "y": 0}, "geometry": {"width": 400, "height": 400}, "data": {"title": "One"}},
+        {"id": "f2", "type": "frame", "position": {"x": 1000, "y": 0}, "geometry": {"width": 400, "height": 400}, "data": {"title": "Two"}},
+    ]
+    notes = [
+        {"id": "child", "type": "sticky_note", "parent": {"id": "f1"}, "position": {"x": 10, "y": 10}, "data": {"content": "Ship it"}},
+        {"id": "loose", "type": "sticky_note", "position": {"x": 200, "y": 200}, "data": {"content": "Placed inside"}},
+        {"id": "other", "type": "sticky_note", "parent": {"id": "f2"}, "position": {"x": 10, "y": 10}, "data": {"content": "Elsewhere"}},
+        {"id": "outside", "type": "sticky_note", "position": {"x": 3000, "y": 3000}, "data": {"content": "Loose"}},
+    ]
+
+    def handler(request):
+        path = request.url.path.removeprefix("/v2/boards/b1")
+        params = dict(request.url.params)
+        requested.append((path, params))
+        if path == "":
+            return httpx.Response(200, json={"id": "b1", "name": "Workshop"})
+        by_type = {"frame": frames, "sticky_note": notes}
+        return httpx.Response(200, json={"data": by_type.get(params.get("type"), frames + notes)})
+
+    monkeypatch.setitem(server.token_store, "default", {"access_token": "token"})
+    monkeypatch.setattr(server, "miro_http_client", lambda: httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    monkeypatch.setattr(server, "board_snapshots", {})
+
+    by_type = client.get("/api/miro/boards/b1", params={"types": "sticky_note"}).json()
+    assert sorted(requested, key=str) == [
+        ("", {}),
+        ("/items", {"limit": "50", "type": "frame"}),
+        ("/items", {"limit": "50", "type": "sticky_note"}),
+    ]
+    assert by_type["frames"] == [] and len(by_type["sticky_notes"]) == 4
+    assert "b1" not in server.board_snapshots
+
+    requested.clear()
+    both = client.get("/api/miro/boards/b1", params={"frame_ids": "f1", "types": "sticky_note"}).json()
+    assert ("/items", {"limit": "50", "type": "sticky_note"}) in requested
+    assert both["frames"] == [] and [note["id"] for note in both["sticky_notes"]] == ["child", "loose"]
+
+    # Frame filters need positional membership, so they load the whole board like a full load
+    requested.clear()
+    by_frame = client.get("/api/miro/boards/b1", params={"frame_ids": "f1"}).json()
+    assert sorted(requested, key=str) == [("", {}), ("/items", {"limit": "50"})]
+    assert [frame["id"] for frame in by_frame["frames"]] == ["f1"]
+    assert [note["id"] for note in by_frame["sticky_notes"]] == ["child", "loose"]
+
+    requested.clear()
+    full = client.get("/api/miro/boards/b1", params={"format": "columnar"}).json()
+    assert requested == []
+    f1_notes = full["frames"]["notes"][full["frames"]["id"].index("f1")]
+    assert [full["sticky_notes"]["id"][i] for i in f1_notes] == ["child", "loose"]
+    assert client.get("/api/miro/boards/b1", params={"frame_ids": "f2"}).json()["sticky_notes"][0]["id"] == "other"
+    assert requested == []
+
+
+def test_llm_calls_share_one_process_wide_limit(monkeypatch):
+    import asyncio
+    from types import SimpleNamespace
+
+    in_flight = {server.SLIDE_SYSTEM_PROMPT: 0, server.CHUNK_SYSTEM_PROMPT: 0}
+    peak = dict(in_flight)
+
+    class FakeGroq:
+        def __init__(self, api_key):
+            self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+        async def create(self, messages, **kwargs):
+            kind = messages[0]["content"]
+            in_flight[kind] += 1
+            peak[kind] = max(peak[kind], in_flight[kind])
+            await asyncio.sleep(0.01)
+            in_flight[kind] -= 1
+            content = '{"points": ["condensed"], "title": "AI", "bullets": ["b"]}'
+            return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+    async def fake_board(board_id, **kwargs):
+        return server.MOCK_MIRO_BOARD.model_copy(update={"id": board_id})
+
+    monkeypatch.setenv("GROQ_API_KEY", "test-key")
+    monkeypatch.setattr(server, "AsyncGroq", FakeGroq)
+    monkeypatch.setattr(server, "llm_semaphore", asyncio.Semaphore(2))
+    monkeypatch.setattr(server, "map_reduce_semaphore", asyncio.Semaphore(3))
+    monkeypatch.setattr(server, "summary_cache", server.SummaryCache(16))
+    monkeypatch.setattr(server, "MAP_REDUCE_NOTE_THRESHOLD", 2)
+    monkeypatch.setattr(server, "MAP_REDUCE_CHUNK_SIZE", 2)
+    monkeypatch.setitem(server.token_store, "default", {"access_token": "token"})
+    monkeypatch.setattr(server, "load_miro_board", fake_board)
+
+    response = client.post("/api/miro/boards/batch", json={"board_ids": ["b1", "b2"]}).json()
+
+    assert all(slide["slide"]["title"] == "AI" for board in response["boards"] for slide in board["slides"])
+    # Slide prompts and map steps each stay within their own budget, however many are queued
+    assert peak == {server.SLIDE_SYSTEM_PROMPT: 2, server.CHUNK_SYSTEM_PROMPT: 3}
+
+
+def test_summarize_rejects_malformed_positions():
+    response = client.post("/api/summarize", json={"notes": ["a", "b"], "frame_title": "T", "positions": [[1], [2, 3]]})
+
+    assert response.status_code == 422
+
+
+def test_llm_answer_without_bullets_falls_back_to_extractive(monkeypatch):
+    answers = iter([{"title": "No bullets", "aspirational_insight": "Onward"}, {"title": "Bad bullets", "bullets": "not a list"}])
+
+    async def fake_llm(api_key, system_prompt, prompt, max_tokens=500, model=None):
+        return next(answers)
+
+    monkeypatch.setenv("GROQ_API_KEY", "test-key")
+    monkeypatch.setattr(server, "request_llm_json", fake_llm)
+    monkeypatch.setattr(server, "summary_cache", server.SummaryCache(16))
+    notes = ["Improve onboarding for new customers", "Team offsite in June", "improve onboarding for new customers!"]
+    expected = server.extractive_summary(notes, "Goals").bullets
+
+    first = client.post("/api/summarize", json={"notes": notes, "frame_title": "Goals"}).json()
+    second = client.post("/api/summarize", json={"notes": notes, "frame_title": "Other"}).json()
+
+    assert first["bullets"] == expected + ["✦ Onward"]
+    assert second["bullets"] == server.extractive_summary(notes, "Other").bullets
+
+
+def test_asset_cache_survives_concurrent_stores(tmp_path):
+    from concurrent.futures import ThreadPoolExecutor
+
+    cache = server.AssetCache(tmp_path, max_bytes=50 * 1024)
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        hashes = list(pool.map(lambda i: cache.store(f"b1/img{i}@v1", f"asset {i}".encode() * 20, "image/png"), range(400)))
+
+    assert len(set(hashes)) == 400
+    index = server.AssetCache(tmp_path, max_bytes=50 * 1024)
+    assert index.files == cache.files and index.sources == cache.sources
+    assert cache.total_bytes == sum(meta["size"] for meta in cache.files.values()) <= 50 * 1024
+    assert index.total_bytes == cache.total_bytes
+
+    # A lookup makes a file the most recently used one, so eviction takes the others first
+    oldest_key = next(key for key, value in cache.sources.items() if value == next(iter(cache.files)))
+    kept = cache.lookup(oldest_key)
+    cache.max_bytes = 1000
+    cache.evict()
+    assert kept in cache.files and cache.total_bytes <= 1000
+    assert all(cache.path_for(content_hash).exists() for content_hash in cache.files)
+
+
+def test_asset_downloads_only_send_miro_token_to_miro(tmp_path, monkeypatch):
+    import asyncio
+    import httpx
+
+    seen = {}
+
+    def handler(request):
+        seen[request.url.host] = request.headers.get("Authorization")
+        if request.url.host == "api.miro.com" and request.url.path.endswith("/resources/doc"):
+            return httpx.Response(200, json={"url": "https://signed.s3.test/doc?sig=1"})
+        if request.url.host == "api.miro.com":
+            return httpx.Response(302, headers={"location": "https://redirect.s3.test/img"})
+        return httpx.Response(200, content=request.url.host.encode(), headers={"content-type": "image/png"})
+
+    monkeypatch.setattr(server, "resolve_host", fake_public_dns)
+    monkeypatch.setattr(server, "asset_cache", server.AssetCache(tmp_path, max_bytes=10_000))
+    assets = [
+        server.BoardAsset(id="img", type="image", x=0, y=0, width=1, height=1, source_url=f"{server.MIRO_API_BASE}/boards/b1/resources/img"),
+        server.BoardAsset(id="doc", type="document", x=0, y=0, width=1, height=1, source_url=f"{server.MIRO_API_BASE}/boards/b1/resources/doc"),
+        server.BoardAsset(id="embed", type="embed", x=0, y=0, width=1, height=1, source_url="https://thumbs.video.test/preview.jpg"),
+    ]
+
+    async def download():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as http_client:
+            return [await server.download_asset(http_client, "token", "b1", asset) for asset in assets]
+
+    downloaded = asyncio.run(download())
+
+    assert all(asset.content_hash for asset in downloaded)
+    assert seen == {"api.miro.com": "Bearer token", "redirect.s3.test": None, "signed.s3.test": None, "thumbs.video.test": None}
+
+
+def test_late_summary_tasks_are_capped(monkeypatch):
+    import asyncio
+
+    started = []
+
+    async def slow_llm(api_key, system_prompt, prompt, max_tokens=500, model=None):
+        started.append(prompt)
+        await asyncio.sleep(0.3)
+        return {"title": "AI title", "bullets": ["ai bullet"]}
+
+    monkeypatch.setenv("GROQ_API_KEY", "test-key")
+    monkeypatch.setattr(server, "request_llm_json", slow_llm)
+    monkeypatch.setattr(server, "summary_cache", server.SummaryCache(16))
+    monkeypatch.setattr(server, "LATE_SUMMARY_MAX_TASKS", 1)
+    monkeypatch.setattr(server, "late_summary_tasks", set())
+
+    with TestClient(server.app) as live_client:
+        response = live_client.post("/api/summarize-all", params={"deadline_ms": 50}).json()
+        assert response["degraded_count"] == len(started) > 1
+        assert len(server.late_summary_tasks) == 1
+
+
+def test_asset_host_failures_do_not_open_miro_breaker(tmp_path, monkeypatch):
+    import asyncio
+    import httpx
+
+    def handler(request):
+        if request.url.host == "api.miro.com":
+            return httpx.Response(302, headers={"location": "https://files.s3.test/img"})
+        return httpx.Response(500)
+
+    breaker = server.CircuitBreaker("miro", slow_call_seconds=5, min_calls=2, error_rate=0.5)
+    monkeypatch.setattr(server, "resolve_host", fake_public_dns)
+    monkeypatch.setattr(server, "asset_cache", server.AssetCache(tmp_path, max_bytes=10_000))
+    assets = [
+        server.BoardAsset(id=f"embed{i}", type="embed", x=0, y=0, width=1, height=1, source_url=f"https://thumbs.test/{i}.jpg")
+        for i in range(4)
+    ] + [server.BoardAsset(id="img", type="image", x=0, y=0, width=1, height=1, source_url=f"{server.MIRO_API_BASE}/boards/b1/resources/img")]
+
+    async def download():
+        transport = httpx.MockTransport(handler)
+        async with httpx.AsyncClient(transport=server.CircuitBreakerTransport(breaker, transport)) as miro_client, \
+                httpx.AsyncClient(transport=transport) as http_client:
+            return [await server.download_asset(http_client, "token", "b1", asset, miro_client=miro_client) for asset in assets]
+
+    downloaded = asyncio.run(download())
+
+    assert all(asset.content_hash is None for asset in downloaded)
+    status = breaker.status()
+    assert (status["state"], status["recent_calls"], status["recent_failures"]) == ("closed", 1, 0)
+
+
+def test_profiles_are_pruned_to_the_newest(tmp_path, monkeypatch):
+    monkeypatch.setattr(server, "PROFILING_TOKEN", "secret")
+    monkeypatch.setattr(server, "PROFILE_DIR", tmp_path)
+    monkeypatch.setattr(server, "PROFILE_MAX_FILES", 2)
+    for name in ["20250101T000000-aaaaaaaa", "20250102T000000-bbbbbbbb"]:
+        (tmp_path / f"{name}.folded").write_text("old 1\n")
+
+    profile_id = client.get("/api/board", headers={"X-Profile-Token": "secret"}).headers["X-Profile-Id"]
+
+    assert sorted(path.stem for path in tmp_path.glob("*.folded")) == ["20250102T000000-bbbbbbbb", profile_id]
+
+
+def test_batch_export_reports_expired_token_for_every_board(monkeypatch):
+    import asyncio
+    import httpx
+
+    async def handler(request):
+        # Let every board load reach Miro before the first 401 comes back
+        await asyncio.sleep(0.01)
+        return httpx.Response(401, json={"message": "token expired"})
+
+    monkeypatch.setitem(server.token_store, "default", {"access_token": "token"})
+    monkeypatch.setattr(server, "miro_http_client", lambda: httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    monkeypatch.setattr(server, "board_snapshots", {})
+
+    response = client.post("/api/miro/boards/batch", json={"board_ids": ["b1", "b2", "b3"]}).json()
+
+    assert [(error["board_id"], error["status_code"]) for error in response["errors"]] == [("b1", 401), ("b2", 401), ("b3", 401)]
+    assert "default" not in server.token_store
+
+
+def test_batch_export_reuses_board_snapshots(monkeypatch):
+    import httpx
+
+    requested = []
+
+    def handler(request):
+        requested.append(request.url.path)
+        if request.url.path == "/v2/boards/b1":
+            return httpx.Response(200, json={"id": "b1", "name": "Workshop"})
+        return httpx.Response(200, json={"data": [
+            {"id": "f1", "type": "frame", "position": {"x": 0, "y": 0}, "geometry": {"width": 400, "height": 400}, "data": {"title": "Ideas"}},
+            {"id": "s1", "type": "sticky_note", "parent": {"id": "f1"}, "position": {"x": 10, "y": 10}, "data": {"content": "Ship it"}},
+        ]})
+
+    monkeypatch.setitem(server.token_store, "default", {"access_token": "token"})
+    monkeypatch.setattr(server, "miro_http_client", lambda: httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    monkeypatch.setattr(server, "board_snapshots", {})
+
+    client.get("/api/miro/boards/b1")
+    fetched = len(requested)
+    response = client.post("/api/miro/boards/batch", json={"board_ids": ["b1"], "mode": "fast"}).json()
+
+    assert len(requested) == fetched
+    assert response["boards"][0]["slides"][0]["raw_notes"] == ["Ship it"]
+
+
+def test_asset_downloads_refuse_private_and_non_https_urls(tmp_path, monkeypatch):
+    import asyncio
+    import httpx
+
+    fetched = []
+
+    def handler(request):
+        fetched.append(str(request.url))
+        if request.url.host == "bounce.test":
+            return httpx.Response(302, headers={"location": "https://10.0.0.7/secret"})
+        if request.url.host == "pointer.test":
+            return httpx.Response(200, json={"url": "https://127.0.0.1/admin"})
+        return httpx.Response(200, content=b"public", headers={"content-type": "image/png"})
+
+    async def fake_dns(host):
+        return {"metadata.test": ["169.254.169.254"], "mixed.test": ["93.184.216.34", "192.168.1.5"]}.get(host, ["93.184.216.34"])
+
+    monkeypatch.setattr(server, "resolve_host", fake_dns)
+    monkeypatch.setattr(server, "asset_cache", server.AssetCache(tmp_path, max_bytes=10_000))
+    urls = [
+        "http://thumbs.test/plain.jpg",
+        "https://169.254.169.254/latest/meta-data",
+        "https://metadata.test/latest/meta-data",
+        "https://mixed.test/img.jpg",
+        "https://bounce.test/img.jpg",
+        "https://pointer.test/img.jpg",
+        "https://thumbs.test/ok.jpg",
+    ]
+    assets = [server.BoardAsset(id=f"embed{i}", type="embed", x=0, y=0, width=1, height=1, source_url=url) for i, url in enumerate(urls)]
+
+    async def download():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as http_client:
+            return [await server.download_asset(http_client, "token", "b1", asset) for asset in assets]
+
+    downloaded = asyncio.run(download())
+
+    assert [asset.content_hash is not None for asset in downloaded] == [False] * 6 + [True]
+    assert fetched == ["https://bounce.test/img.jpg", "https://pointer.test/img.jpg", "https://thumbs.test/ok.jpg"]
+
+
+def test_calls_from_before_half_open_do_not_decide_the_probe():
+    now = [0.0]
+    breaker = server.CircuitBreaker("miro", slow_call_seconds=5, open_seconds=30, clock=lambda: now[0])
+
+    stale = [breaker.before_call(), breaker.before_call()]
+    breaker._open(now[0])
+    now[0] = 31
+    probe = breaker.before_call()
+    assert breaker.status()["state"] == "half_open"
+
+    breaker.record(True, 0.1, stale[0])
+    breaker.record(False, 31, stale[1])
+    breaker.release(stale[0])
+    assert (breaker.state, breaker.probes_in_flight) == ("half_open", 1)
+
+    breaker.record(True, 0.1, probe)
+    assert (breaker.state, breaker.probes_in_flight) == ("closed", 0)
@@ -0,0 +1,52 @@
+"""Replay recorded Miro webhook events against the webhook receiver.
+
+The real Miro webhook service cannot reach a local server, so events are kept
+as JSON lines (one webhook payload per line) and posted here instead.
+
+    python tests/webhook_replay.py events.jsonl --url http://localhost:8000 [--secret SECRET]
+"""
+import argparse
+import json
+import sys
+
+WEBHOOK_PATH = "/api/miro/webhook"
+
+
+def load_events(path):
+    with open(path) as events_file:
+        return [json.loads(line) for line in events_file if line.strip()]
+
+
+def item_event(board_id, event_type, item):
+    """Build a webhook payload in the shape Miro sends"""
+    return {"event": {"boardId": board_id, "type": event_type, "item": item}}
+
+
+def replay_events(events, post, secret=None):
+    """Post each event in order with ``post(path, json=..., params=...)`` and return the responses"""
+    params = {"secret": secret} if secret else {}
+    responses = []
+    for event in events:
+        response = post(WEBHOOK_PATH, json=event, params=params)
+        response.raise_for_status()
+        responses.append(response.json())
+    return responses
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("events", help="JSON lines file of webhook payloads")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--secret", default=None)
+    args = parser.parse_args()
+
+    import httpx
+
+    with httpx.Client(base_url=args.url) as http_client:
+        for response in replay_events(load_events(args.events), http_client.post, args.secret):
+            print(json.dumps(response))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())